@@ -0,0 +1,164 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+from checkers_bitboard import BitboardCheckers, PLAYER_ONE, PROMOTION_ROWS
+from checkers_tablebase import (DEFAULT_TABLEBASE_DIR, Tablebase, oriented_pieces, position_index,
+                                signature_of, table_size, write_table)
+
+
+def swap(signature):
+    """ Signature seen from the other side. """
+    return signature[2], signature[3], signature[0], signature[1]
+
+
+def signatures(max_pieces):
+    """ Every signature with pieces on both sides, up to max_pieces in total. """
+    found = []
+    for total in range(2, max_pieces + 1):
+        for men1 in range(total):
+            for kings1 in range(total - men1):
+                for men2 in range(total - men1 - kings1 + 1):
+                    kings2 = total - men1 - kings1 - men2
+                    if men1 + kings1 > 0 and men2 + kings2 > 0:
+                        found.append((men1, kings1, men2, kings2))
+    return found
+
+
+def solve_order(max_pieces):
+    """
+    Groups of signatures that are solved together, in batches that only depend
+    on earlier batches. A quiet move leads from a signature to the swapped one,
+    a promotion removes a man and a capture removes a piece, so batches go by
+    number of pieces and then by number of men.
+    """
+    levels = {}
+    for signature in signatures(max_pieces):
+        if swap(signature) < signature:
+            continue
+        group = tuple(sorted({signature, swap(signature)}))
+        level = (sum(signature), signature[0] + signature[2])
+        levels.setdefault(level, []).append(group)
+    return [levels[level] for level in sorted(levels)]
+
+
+def placements(signature):
+    """ Every placement of the pieces of a signature as (men, kings, men, kings) masks. """
+    def place(kind, taken, pieces):
+        if kind == len(signature):
+            yield pieces
+            return
+        free = [s for s in range(32) if not taken >> s & 1]
+        for chosen in combinations(free, signature[kind]):
+            mask = sum(1 << s for s in chosen)
+            yield from place(kind + 1, taken | mask, pieces + (mask,))
+    return place(0, 0, ())
+
+
+def solve_group(group, directory):
+    """
+    Retrograde analysis of one group of signatures with Player 1 to move.
+    Moves leaving the group are looked up in the smaller tables already on
+    disk. Results inside the group are settled in order of distance, like a
+    breadth-first search running backwards from the lost positions.
+    """
+    tablebase = Tablebase(directory)
+    position = BitboardCheckers()
+    offsets, total = {}, 0
+    for signature in group:
+        offsets[signature] = total
+        total += table_size(signature)
+
+    parents = [[] for _ in range(total)]
+    # Moves not yet known to lose, a child that is not a win for the opponent never counts down
+    remaining = [0] * total
+    loss_distance = [0] * total
+    # Positions waiting to be settled at each distance, as (position, is a win)
+    pending = {}
+    results = [0] * total
+    settled = bytearray(total)
+
+    for signature in group:
+        offset = offsets[signature]
+        for pieces in placements(signature):
+            men1, kings1, men2, kings2 = pieces
+            # Men on their promotion row cannot happen
+            if men1 & PROMOTION_ROWS[0] or men2 & PROMOTION_ROWS[1]:
+                continue
+            node = offset + position_index(pieces)
+            position.men = [men1, men2]
+            position.kings = [kings1, kings2]
+            position.turn = PLAYER_ONE
+            moves = position.legal_moves()
+            remaining[node] = len(moves)
+            best_win = None
+            for move in moves:
+                undo = position.make_move(move)
+                child = oriented_pieces(position)
+                position.unmake_move(undo)
+                child_signature = signature_of(child)
+                if child_signature in offsets:
+                    parents[offsets[child_signature] + position_index(child)].append(node)
+                    continue
+                result = tablebase.probe_pieces(child)
+                if result > 0:
+                    remaining[node] -= 1
+                    loss_distance[node] = max(loss_distance[node], result + 1)
+                elif result < 0 and (best_win is None or -result < best_win):
+                    best_win = -result
+            if best_win is not None:
+                pending.setdefault(best_win, []).append((node, True))
+            elif remaining[node] == 0:
+                pending.setdefault(loss_distance[node], []).append((node, False))
+    tablebase.close()
+
+    distance = 0
+    while pending:
+        for node, won in pending.pop(distance, []):
+            if settled[node]:
+                continue
+            settled[node] = 1
+            if distance > 127:
+                raise ValueError(f"distance {distance} in {group} does not fit in a table")
+            results[node] = distance if won else -(distance + 1)
+            for parent in parents[node]:
+                if settled[parent]:
+                    continue
+                if not won:
+                    pending.setdefault(distance + 1, []).append((parent, True))
+                else:
+                    remaining[parent] -= 1
+                    loss_distance[parent] = max(loss_distance[parent], distance + 1)
+                    if remaining[parent] == 0:
+                        pending.setdefault(loss_distance[parent], []).append((parent, False))
+        distance += 1
+
+    for signature in group:
+        offset = offsets[signature]
+        write_table(directory, signature, results[offset:offset + table_size(signature)])
+    return group, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the checkers endgame tablebase.")
+    parser.add_argument("--pieces", type=int, default=4, help="Solve every position with up to this many pieces.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of solving processes.")
+    parser.add_argument("--output", type=str, default=DEFAULT_TABLEBASE_DIR, help="Directory of the table files.")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # Groups of one batch are independent, the next batch reads their files
+        for batch in solve_order(args.pieces):
+            for group, positions in executor.map(solve_group, batch, [args.output] * len(batch)):
+                names = ", ".join("{}{}{}{}".format(*signature) for signature in group)
+                print(f"Solved {names}: {positions} positions, {time.perf_counter() - start:.0f}s")
+
+    print(f"Wrote the {args.pieces}-piece tablebase to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import random
+
+import numpy as np
+
+# Constants
+BOARD_SIZE = 8  # 8x8 board, of which only the 32 dark squares are used
+PLAYER_ONE = 1  # Player 1's pieces, they start on rows 0-2 and move down
+PLAYER_TWO = -1  # Player 2's pieces, they start on rows 5-7 and move up
+KING_ONE = 2  # Player 1's kings
+KING_TWO = -2  # Player 2's kings
+
+# Diagonal directions as (row step, column step)
+DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+# Directions a man may move in, per side (0 for Player 1, 1 for Player 2)
+FORWARD = [(0, 1), (2, 3)]
+# The opposite of every direction
+REVERSE = [3, 2, 1, 0]
+
+# Dark square (row, col) of every square index, four squares per row
+SQUARE_COORDS = [(s // 4, 2 * (s % 4) + (1 - (s // 4) % 2)) for s in range(32)]
+COORD_TO_SQUARE = {coords: s for s, coords in enumerate(SQUARE_COORDS)}
+FULL_MASK = (1 << 32) - 1
+# Squares where a man of each side is promoted
+PROMOTION_ROWS = [sum(1 << s for s in range(28, 32)), sum(1 << s for s in range(4))]
+
+# Piece-square values of men: ADVANCE_VALUE for every row moved towards
+# promotion, BACK_RANK_VALUE for a man still guarding its own back row
+ADVANCE_VALUE = 3
+BACK_RANK_VALUE = 10
+MAN_SQUARE_VALUES = [
+    [ADVANCE_VALUE * (s // 4) + (BACK_RANK_VALUE if s < 4 else 0) for s in range(32)],
+    [ADVANCE_VALUE * (7 - s // 4) + (BACK_RANK_VALUE if s >= 28 else 0) for s in range(32)],
+]
+
+
+# Zobrist keys: ZOBRIST_MEN[side][square], ZOBRIST_KINGS[side][square] and the
+# key mixed in while Player 2 is to move
+_zobrist_random = random.Random(20240601)
+ZOBRIST_MEN = [[_zobrist_random.getrandbits(64) for _ in range(32)] for _ in range(2)]
+ZOBRIST_KINGS = [[_zobrist_random.getrandbits(64) for _ in range(32)] for _ in range(2)]
+ZOBRIST_PLAYER_TWO = _zobrist_random.getrandbits(64)
+
+
+def _neighbour(square, direction):
+    """ Square one diagonal step away, or -1 if that leaves the board. """
+    row, col = SQUARE_COORDS[square]
+    dr, dc = DIRECTIONS[direction]
+    return COORD_TO_SQUARE.get((row + dr, col + dc), -1)
+
+
+# STEP[d][s]: square reached from s in direction d, or -1
+STEP = [[_neighbour(s, d) for s in range(32)] for d in range(4)]
+
+
+def _step_groups(direction):
+    """
+    Group the squares by the index difference of a step in one direction.
+    The difference depends on the row parity, so a step of a whole bitboard
+    is one masked shift per group.
+    """
+    groups = {}
+    for s in range(32):
+        t = STEP[direction][s]
+        if t >= 0:
+            groups[t - s] = groups.get(t - s, 0) | (1 << s)
+    return [(mask, delta) for delta, mask in groups.items()]
+
+
+STEP_GROUPS = [_step_groups(d) for d in range(4)]
+
+
+def shift(mask, direction):
+    """ Move every square of a bitboard one step in a direction. """
+    moved = 0
+    for group, delta in STEP_GROUPS[direction]:
+        if delta > 0:
+            moved |= (mask & group) << delta
+        else:
+            moved |= (mask & group) >> -delta
+    return moved
+
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(mask):
+        return bin(mask).count("1")
+
+
+def squares(mask):
+    """ Yield the index of every set bit. """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BitboardCheckers:
+    """
+    Checkers position on the 32 playable squares.
+    Men and kings of each side are kept in separate bitboards, so legal moves
+    come from a few shifts and masks instead of a scan of all 64 squares.
+    Moves use the (row, col) pairs of the board games, ((r1, c1), (r2, c2)).
+    """
+
+    def __init__(self, multi_jump=False):
+        # Men and kings of Player 1 (index 0) and Player 2 (index 1)
+        self.men = [0, 0]
+        self.kings = [0, 0]
+        self.turn = PLAYER_ONE
+        # If True a jump that can be continued keeps the turn with the same player
+        self.multi_jump = multi_jump
+        # Zobrist hash of the pieces and the player to move, kept up to date by make_move
+        self.hash = 0
+        # Evaluation terms per side, kept up to date by make_move: number of men,
+        # number of kings and the piece-square sum of the men
+        self.man_count = [0, 0]
+        self.king_count = [0, 0]
+        self.square_values = [0, 0]
+        self.setup()
+
+    def setup(self):
+        """ Place the men of both players on their first three rows. """
+        self.men = [sum(1 << s for s in range(12)), sum(1 << s for s in range(20, 32))]
+        self.kings = [0, 0]
+        self.turn = PLAYER_ONE
+        self.hash = self.compute_hash()
+        self.compute_terms()
+
+    def compute_terms(self):
+        """ Recount the evaluation terms, needed after the bitboards are set directly. """
+        for side in range(2):
+            self.man_count[side] = popcount(self.men[side])
+            self.king_count[side] = popcount(self.kings[side])
+            self.square_values[side] = sum(MAN_SQUARE_VALUES[side][s] for s in squares(self.men[side]))
+
+    def compute_hash(self):
+        """ Zobrist hash of the position computed from scratch. """
+        key = 0 if self.turn == PLAYER_ONE else ZOBRIST_PLAYER_TWO
+        for side in range(2):
+            for s in squares(self.men[side]):
+                key ^= ZOBRIST_MEN[side][s]
+            for s in squares(self.kings[side]):
+                key ^= ZOBRIST_KINGS[side][s]
+        return key
+
+    def copy(self):
+        new = BitboardCheckers.__new__(BitboardCheckers)
+        new.men = self.men[:]
+        new.kings = self.kings[:]
+        new.turn = self.turn
+        new.multi_jump = self.multi_jump
+        new.hash = self.hash
+        new.man_count = self.man_count[:]
+        new.king_count = self.king_count[:]
+        new.square_values = self.square_values[:]
+        return new
+
+    def side(self):
+        """ Index of the player to move, 0 for Player 1 and 1 for Player 2. """
+        return 0 if self.turn == PLAYER_ONE else 1
+
+    def empty(self):
+        return FULL_MASK & ~(self.men[0] | self.men[1] | self.kings[0] | self.kings[1])
+
+    def jump_moves(self, movers=None):
+        """ All captures of the player to move, optionally limited to some pieces. """
+        side = self.side()
+        men, kings = self.men[side], self.kings[side]
+        if movers is not None:
+            men &= movers
+            kings &= movers
+        opponents = self.men[1 - side] | self.kings[1 - side]
+        empty = self.empty()
+        moves = []
+        for d in range(4):
+            pieces = men | kings if d in FORWARD[side] else kings
+            if not pieces:
+                continue
+            # Opponent pieces with one of ours behind them, then an empty square after them
+            landings = shift(shift(pieces, d) & opponents, d) & empty
+            back = STEP[REVERSE[d]]
+            for land in squares(landings):
+                moves.append((SQUARE_COORDS[back[back[land]]], SQUARE_COORDS[land]))
+        return moves
+
+    def simple_moves(self):
+        """ All non-capturing moves of the player to move. """
+        side = self.side()
+        men, kings = self.men[side], self.kings[side]
+        empty = self.empty()
+        moves = []
+        for d in range(4):
+            pieces = men | kings if d in FORWARD[side] else kings
+            for group, delta in STEP_GROUPS[d]:
+                movable = pieces & group
+                if not movable:
+                    continue
+                targets = (movable << delta if delta > 0 else movable >> -delta) & empty
+                for target in squares(targets):
+                    moves.append((SQUARE_COORDS[target - delta], SQUARE_COORDS[target]))
+        return moves
+
+    def legal_moves(self):
+        """ Captures are mandatory, so simple moves only count when there are none. """
+        return self.jump_moves() or self.simple_moves()
+
+    def jump_moves_from(self, row, col):
+        """ Captures available to the piece on one square. """
+        return self.jump_moves(1 << COORD_TO_SQUARE[(row, col)])
+
+    def make_move(self, move):
+        """
+        Move a piece in place, handling captures, promotion and the turn.
+        Returns an undo record for unmake_move: the moved squares, whether the
+        piece was a king, the captured square and kind, whether the piece was
+        promoted, whose turn it was (a continued multi-jump keeps it), the hash
+        and the piece-square sums.
+        """
+        (r1, c1), (r2, c2) = move
+        src, dst = COORD_TO_SQUARE[(r1, c1)], COORD_TO_SQUARE[(r2, c2)]
+        turn = self.turn
+        side = 0 if turn == PLAYER_ONE else 1
+        src_bit, dst_bit = 1 << src, 1 << dst
+        old_hash = self.hash
+        square_values = self.square_values
+        old_values = square_values[0], square_values[1]
+
+        moved_king = bool(self.kings[side] & src_bit)
+        if moved_king:
+            self.kings[side] ^= src_bit | dst_bit
+            self.hash ^= ZOBRIST_KINGS[side][src] ^ ZOBRIST_KINGS[side][dst]
+        else:
+            self.men[side] ^= src_bit | dst_bit
+            self.hash ^= ZOBRIST_MEN[side][src] ^ ZOBRIST_MEN[side][dst]
+            square_values[side] += MAN_SQUARE_VALUES[side][dst] - MAN_SQUARE_VALUES[side][src]
+
+        captured_bit, captured_king = 0, False
+        if abs(r2 - r1) == 2:
+            # Remove the captured piece
+            captured = COORD_TO_SQUARE[((r1 + r2) // 2, (c1 + c2) // 2)]
+            captured_bit = 1 << captured
+            captured_king = bool(self.kings[1 - side] & captured_bit)
+            if captured_king:
+                self.kings[1 - side] ^= captured_bit
+                self.hash ^= ZOBRIST_KINGS[1 - side][captured]
+                self.king_count[1 - side] -= 1
+            else:
+                self.men[1 - side] ^= captured_bit
+                self.hash ^= ZOBRIST_MEN[1 - side][captured]
+                self.man_count[1 - side] -= 1
+                square_values[1 - side] -= MAN_SQUARE_VALUES[1 - side][captured]
+            # The same player continues while the piece can keep jumping
+            if self.multi_jump and self.jump_moves(dst_bit):
+                return (src_bit, dst_bit, moved_king, captured_bit, captured_king, False, turn, old_hash,
+                        old_values)
+
+        # Promote to king
+        promoted = bool(self.men[side] & dst_bit & PROMOTION_ROWS[side])
+        if promoted:
+            self.men[side] ^= dst_bit
+            self.kings[side] |= dst_bit
+            self.hash ^= ZOBRIST_MEN[side][dst] ^ ZOBRIST_KINGS[side][dst]
+            self.man_count[side] -= 1
+            self.king_count[side] += 1
+            square_values[side] -= MAN_SQUARE_VALUES[side][dst]
+
+        self.turn = -turn
+        self.hash ^= ZOBRIST_PLAYER_TWO
+        return src_bit, dst_bit, moved_king, captured_bit, captured_king, promoted, turn, old_hash, old_values
+
+    def unmake_move(self, undo):
+        """ Take back a move using the record returned by make_move. """
+        src_bit, dst_bit, moved_king, captured_bit, captured_king, promoted, turn, old_hash, old_values = undo
+        side = 0 if turn == PLAYER_ONE else 1
+        self.turn = turn
+        self.hash = old_hash
+        self.square_values[0], self.square_values[1] = old_values
+        if promoted:
+            self.kings[side] ^= dst_bit
+            self.men[side] |= dst_bit
+            self.man_count[side] += 1
+            self.king_count[side] -= 1
+        if moved_king:
+            self.kings[side] ^= src_bit | dst_bit
+        else:
+            self.men[side] ^= src_bit | dst_bit
+        if captured_king:
+            self.kings[1 - side] |= captured_bit
+            self.king_count[1 - side] += 1
+        elif captured_bit:
+            self.men[1 - side] |= captured_bit
+            self.man_count[1 - side] += 1
+
+    def piece_count(self, side):
+        return self.man_count[side] + self.king_count[side]
+
+    def grid(self):
+        """ 8x8 array of piece codes, used for drawing. """
+        board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=int)
+        for side, (man, king) in enumerate([(PLAYER_ONE, KING_ONE), (PLAYER_TWO, KING_TWO)]):
+            for s in squares(self.men[side]):
+                board[SQUARE_COORDS[s]] = man
+            for s in squares(self.kings[side]):
+                board[SQUARE_COORDS[s]] = king
+        return board
@@ -1,117 +1,61 @@
 import numpy as np
+import math
 import random
+import time
 import cv2
-import copy
+
+from checkers_bitboard import BitboardCheckers
+
+ROLLOUT_PLIES = 80  # Random moves played at most in one rollout
+MATERIAL_CUTOFF = 4  # A rollout stops once one side leads by this much material
 
 # Checkers Game Class
 class SimpleCheckers:
     def __init__(self):
-        # Initialize the empty board
-        self.grid = np.zeros((8, 8), dtype=int)
+        # Bitboard position, a jump that can be continued keeps the turn
+        self.position = BitboardCheckers(multi_jump=True)
         self.init_grid()
-        # Player 1 starts the game
-        self.current_turn = 1
+
+    @property
+    def grid(self):
+        """ 8x8 array of the pieces, used for drawing. """
+        return self.position.grid()
+
+    @property
+    def current_turn(self):
+        return self.position.turn
 
     def init_grid(self):
         """ This function put the pieces on the board initially. """
-        # Top rows for Player 1
-        for i in range(3):
-            for j in range(8):
-                # Only dark squares
-                if (i + j) % 2 == 1:
-                    # Player 1 normal pieces
-                    self.grid[i][j] = 1
-        # Bottom rows for Player 2
-        for i in range(5, 8):
-            for j in range(8):
-                if (i + j) % 2 == 1:
-                    # Player 2 normal pieces
-                    self.grid[i][j] = -1
+        # Player 1 men on the top rows, Player 2 men on the bottom rows, Player 1 starts
+        self.position.setup()
 
     def get_moves(self):
         """
         Find all valid moves for the current player.
-        It checks for capturing moves first because jumps are required.
+        Jump moves are returned if there are any because jumps are required.
         """
-        # For capturing moves
-        jumps = []
-        # For regular moves
-        steps = []
-
-        # loop through all the rows and columns
-        for r in range(8):
-            for c in range(8):
-                # If it's the player's normal piece
-                if self.grid[r][c] == self.current_turn:
-                    jumps += self.check_jump_moves(r, c, is_king=False)
-                    steps += self.check_simple_moves(r, c, is_king=False)
-                # If it's a king piece
-                elif self.grid[r][c] == 2 * self.current_turn:
-                    jumps += self.check_jump_moves(r, c, is_king=True)
-                    steps += self.check_simple_moves(r, c, is_king=True)
-        # Jump moves have higher priority
-        return jumps if jumps else steps
-
-    def check_jump_moves(self, row, col, is_king=False):
+        return self.position.legal_moves()
+
+    def check_jump_moves(self, row, col):
         """ Check all possible jump (capture) moves for a piece. """
-        moves = []
-        dirs = [(1, 1), (1, -1), (-1, 1), (-1, -1)] if is_king else [(1, 1), (1, -1)] if self.current_turn == 1 else [(-1, 1), (-1, -1)]
-
-        for dx, dy in dirs:
-            enemy_x, enemy_y = row + dx, col + dy
-            # Check for an opponent piece in the adjacent square
-            if 0 <= enemy_x < 8 and 0 <= enemy_y < 8 and self.grid[enemy_x][enemy_y] * self.current_turn < 0:
-                # Landing square after the jump
-                land_x, land_y = enemy_x + dx, enemy_y + dy
-                if 0 <= land_x < 8 and 0 <= land_y < 8 and self.grid[land_x][land_y] == 0:
-                    # Valid capturing move
-                    moves.append(((row, col), (land_x, land_y)))
-        return moves
-
-    def check_simple_moves(self, row, col, is_king=False):
-        """ Check all simple moves (non-capturing) for a piece. """
-        moves = []
-        dirs = [(1, 1), (1, -1), (-1, 1), (-1, -1)] if is_king else [(1, 1), (1, -1)] if self.current_turn == 1 else [(-1, 1), (-1, -1)]
-        for dx, dy in dirs:
-            new_x, new_y = row + dx, col + dy
-            if 0 <= new_x < 8 and 0 <= new_y < 8 and self.grid[new_x][new_y] == 0:
-                # Valid regular move
-                moves.append(((row, col), (new_x, new_y)))
-        return moves
+        return self.position.jump_moves_from(row, col)
 
     def apply_move(self, move):
         """
         Move a piece to a new position and handle captures or promotions.
+        After a jump the turn stays with the player while the piece can jump again.
+        The game is changed in place, the returned record lets unmake_move undo it.
         """
-        start, end = move
-        r1, c1 = start
-        r2, c2 = end
-
-        # Move the piece
-        self.grid[r2][c2] = self.grid[r1][c1]
-        self.grid[r1][c1] = 0
-
-        # Remove captured piece if it was a jump
-        if abs(r2 - r1) == 2:
-            mid_r, mid_c = (r1 + r2) // 2, (c1 + c2) // 2
-            self.grid[mid_r][mid_c] = 0
-
-            # Check for multi-jump
-            further_jumps = self.check_jump_moves(r2, c2, is_king=abs(self.grid[r2][c2]) == 2)
-            # Continue the turn
-            if further_jumps:
-                return self
+        return self.position.make_move(move)
 
-        # Promote to king
-        if (self.current_turn == 1 and r2 == 7) or (self.current_turn == -1 and r2 == 0):
-            self.grid[r2][c2] = 2 * self.current_turn
-
-        self.switch_turn()
-        return copy.deepcopy(self)
+    def unmake_move(self, undo):
+        """ Take back a move made with apply_move. """
+        self.position.unmake_move(undo)
 
     def switch_turn(self):
         """ Switch the current player turn. """
-        self.current_turn = -self.current_turn
+        self.position.turn = -self.position.turn
 
     def is_game_done(self):
         """ Check if the game is over by verifying if a player has no moves. """
@@ -119,8 +63,8 @@ class SimpleCheckers:
 
     def who_won(self):
         """ Determine who won the game if it's over. """
-        pieces_p1 = np.sum(self.grid == 1) + np.sum(self.grid == 2)
-        pieces_p2 = np.sum(self.grid == -1) + np.sum(self.grid == -2)
+        pieces_p1 = self.position.piece_count(0)
+        pieces_p2 = self.position.piece_count(1)
 
         # The current player loses if they can't move
         if len(self.get_moves()) == 0:
@@ -133,6 +77,133 @@ class SimpleCheckers:
             return 1
         return 0
 
+    def material(self):
+        """ Men count 1 and kings 2, positive when Player 1 is ahead. """
+        position = self.position
+        return (position.man_count[0] - position.man_count[1]
+                + 2 * (position.king_count[0] - position.king_count[1]))
+
+class MCTSNode:
+    def __init__(self, parent, move, player, moves):
+        self.parent = parent
+        # Move that led here and the player who made it, wins are counted for them
+        self.move = move
+        self.player = player
+        self.visits = 0
+        self.wins = 0.0
+        self.children = []
+        # Legal moves of the position, found once when the node is created
+        self.untried_moves = list(moves)
+        self.terminal = not moves
+
+    def is_fully_expanded(self):
+        return not self.untried_moves
+
+    def best_child(self, explore=1.4):
+        log_visits = math.log(self.visits)
+        return max(self.children,
+                   key=lambda child: child.wins / child.visits + explore * math.sqrt(log_visits / child.visits))
+
+    def expand(self, game):
+        """ Play one random untried move on the game and add its node. """
+        move = self.untried_moves.pop(random.randrange(len(self.untried_moves)))
+        player = game.current_turn
+        undo = game.apply_move(move)
+        child = MCTSNode(self, move, player, game.get_moves())
+        self.children.append(child)
+        return child, undo
+
+    def backpropagate(self, winner):
+        node = self
+        while node:
+            node.visits += 1
+            if winner == node.player:
+                node.wins += 1.0
+            elif winner == 0:
+                node.wins += 0.5
+            node = node.parent
+
+def rollout(game, max_plies=ROLLOUT_PLIES, material_cutoff=MATERIAL_CUTOFF):
+    """
+    Play random moves on the game and return the winner (1, -1 or 0).
+    A game that runs past max_plies or where one side gets material_cutoff ahead
+    is scored by material. The game is restored before returning.
+    """
+    undos = []
+    winner = None
+    for _ in range(max_plies):
+        moves = game.get_moves()
+        if not moves:
+            winner = -game.current_turn
+            break
+        undos.append(game.apply_move(random.choice(moves)))
+        if abs(game.material()) >= material_cutoff:
+            break
+    if winner is None:
+        material = game.material()
+        winner = (material > 0) - (material < 0)
+    for undo in reversed(undos):
+        game.unmake_move(undo)
+    return winner
+
+class MCTSAgent:
+    """
+    UCT search on SimpleCheckers. Every simulation walks down the tree and runs
+    a rollout on one shared game with apply_move and unmake_move, so no
+    positions are copied. The search stops after `simulations` simulations or
+    `time_limit_ms` milliseconds, whichever comes first. At least one of them
+    must be set, and one simulation always runs so there is a move to return.
+    """
+
+    def __init__(self, simulations=1000, time_limit_ms=None, explore=1.4):
+        if simulations is None and time_limit_ms is None:
+            raise ValueError("MCTSAgent needs a simulation count, a time limit or both")
+        self.simulations = simulations
+        self.time_limit_ms = time_limit_ms
+        self.explore = explore
+        # Simulations run by the last search and how many per second
+        self.last_simulations = 0
+        self.last_rate = 0.0
+
+    def select_move(self, game):
+        root = MCTSNode(None, None, -game.current_turn, game.get_moves())
+        if root.terminal:
+            return None
+        start = time.perf_counter()
+        deadline = start + self.time_limit_ms / 1000 if self.time_limit_ms is not None else None
+        count = 0
+
+        while count == 0 or self.simulations is None or count < self.simulations:
+            if count > 0 and deadline is not None and time.perf_counter() > deadline:
+                break
+            node = root
+            undos = []
+
+            # Selection phase: follow UCT down the expanded part of the tree
+            while not node.terminal and node.is_fully_expanded():
+                node = node.best_child(self.explore)
+                undos.append(game.apply_move(node.move))
+
+            # Expansion phase: add one untried move
+            if not node.terminal:
+                node, undo = node.expand(game)
+                undos.append(undo)
+
+            # Simulation phase: light random rollout from the new node
+            winner = rollout(game)
+
+            # Backpropagation phase, then put the game back to the root position
+            node.backpropagate(winner)
+            for undo in reversed(undos):
+                game.unmake_move(undo)
+            count += 1
+
+        elapsed = time.perf_counter() - start
+        self.last_simulations = count
+        self.last_rate = count / elapsed if elapsed > 0 else 0.0
+        # The most visited move is the most reliable choice
+        return max(root.children, key=lambda child: child.visits).move
+
 def display_board(grid):
     """ Draw the checkers board using OpenCV. """
     square_size = 80
@@ -154,14 +225,15 @@ def display_board(grid):
 def main():
     """ Main function to run the game loop. """
     game = SimpleCheckers()
+    agent = MCTSAgent(simulations=None, time_limit_ms=1000)
     cv2.namedWindow("Checkers Game")
 
     while not game.is_game_done():
-        moves = game.get_moves()
-        if not moves:
+        move = agent.select_move(game)
+        if move is None:
             break
-        # Randomly select a move for simplicity
-        game.apply_move(random.choice(moves))
+        game.apply_move(move)
+        print(f"{agent.last_simulations} simulations, {agent.last_rate:.0f} simulations/sec")
 
         img = display_board(game.grid)
         cv2.imshow("Checkers Game", img)
@@ -3,6 +3,10 @@ import copy
 import math
 import cv2
 
+from checkers_bitboard import BitboardCheckers
+from checkers_tablebase import load_tablebase, tablebase_score
+from checkers_transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
 # Constants
 SQUARE_SIZE = 80  # Size of each square in pixels
 BOARD_SIZE = 8  # 8x8 board
@@ -10,6 +14,8 @@ PLAYER_ONE = 1  # Player 1's pieces
 PLAYER_TWO = -1  # Player 2's pieces
 KING_ONE = 2  # Player 1's kings
 KING_TWO = -2  # Player 2's kings
+MAN_VALUE = 100  # Material value of a man in the evaluation
+KING_VALUE = 200  # Material value of a king
 
 # Colors for the board and pieces
 COLORS = {
@@ -24,136 +30,203 @@ COLORS = {
 # Checkers Game Class
 class CheckersGame:
     def __init__(self):
-        self.board = np.zeros((8, 8), dtype=int)
-        self.current_player = PLAYER_ONE
+        # Bitboard position, captures end the turn in this version of the game
+        self.position = BitboardCheckers(multi_jump=False)
         self.initialize_board()
 
+    @property
+    def board(self):
+        """8x8 array of the pieces, used for drawing."""
+        return self.position.grid()
+
+    @property
+    def current_player(self):
+        return self.position.turn
+
     def initialize_board(self):
         """Place pieces on the board for both players."""
-        for i in range(3):  # Top rows for Player 1
-            for j in range(8):
-                if (i + j) % 2 == 1:
-                    self.board[i][j] = PLAYER_ONE
-        for i in range(5, 8):  # Bottom rows for Player 2
-            for j in range(8):
-                if (i + j) % 2 == 1:
-                    self.board[i][j] = PLAYER_TWO
+        self.position.setup()
 
     def get_legal_moves(self):
-        capturing_moves = []
-        regular_moves = []
-
-        for i in range(8):
-            for j in range(8):
-                if self.board[i][j] == self.current_player:
-                    capturing_moves += self.get_capturing_moves(i, j, king=False)
-                    regular_moves += self.get_regular_moves(i, j, king=False)
-                elif self.board[i][j] == 2 * self.current_player:
-                    capturing_moves += self.get_capturing_moves(i, j, king=True)
-                    regular_moves += self.get_regular_moves(i, j, king=True)
-
-        return capturing_moves if capturing_moves else regular_moves
-
-    def get_capturing_moves(self, i, j, king=False):
-        moves = []
-        directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)] if king else [(1, 1), (1, -1)] if self.current_player == PLAYER_ONE else [(-1, 1), (-1, -1)]
-
-        for dx, dy in directions:
-            x, y = i + dx, j + dy
-            if 0 <= x < 8 and 0 <= y < 8 and self.board[x][y] * self.current_player < 0:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < 8 and 0 <= ny < 8 and self.board[nx][ny] == 0:
-                    moves.append(((i, j), (nx, ny)))
-        return moves
-
-    def get_regular_moves(self, i, j, king=False):
-        moves = []
-        directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)] if king else [(1, 1), (1, -1)] if self.current_player == PLAYER_ONE else [(-1, 1), (-1, -1)]
+        return self.position.legal_moves()
 
-        for dx, dy in directions:
-            x, y = i + dx, j + dy
-            if 0 <= x < 8 and 0 <= y < 8 and self.board[x][y] == 0:
-                moves.append(((i, j), (x, y)))
-        return moves
+    def get_capture_moves(self):
+        return self.position.jump_moves()
 
     def make_move(self, move):
-        start, end = move
-        i, j = start
-        x, y = end
-        self.board[x][y] = self.board[i][j]
-        self.board[i][j] = 0
-
-        if abs(x - i) == 2:
-            self.board[(i + x) // 2][(j + y) // 2] = 0
-
-        if (self.current_player == PLAYER_ONE and x == 7) or (self.current_player == PLAYER_TWO and x == 0):
-            self.board[x][y] = 2 * self.current_player
+        """Play a move in place and return its undo record."""
+        return self.position.make_move(move)
 
-        self.switch_player()
+    def unmake_move(self, undo):
+        self.position.unmake_move(undo)
 
     def switch_player(self):
-        self.current_player = -self.current_player
+        self.position.turn = -self.position.turn
 
     def is_terminal(self):
         return len(self.get_legal_moves()) == 0
 
+    def who_won(self):
+        """The player to move loses once they have no moves left."""
+        return -self.current_player if self.is_terminal() else None
+
     def evaluate(self):
-        score = 0
-        for row in self.board:
-            for piece in row:
-                if piece == PLAYER_ONE:
-                    score += 1
-                elif piece == PLAYER_TWO:
-                    score -= 1
-                elif piece == KING_ONE:
-                    score += 2
-                elif piece == KING_TWO:
-                    score -= 2
-        return score
+        """Material and piece-square score for Player 1, read from the totals the position keeps."""
+        position = self.position
+        return (MAN_VALUE * (position.man_count[0] - position.man_count[1])
+                + KING_VALUE * (position.king_count[0] - position.king_count[1])
+                + position.square_values[0] - position.square_values[1])
 
     def get_next_state(self, move):
-        new_game = copy.deepcopy(self)
+        new_game = copy.copy(self)
+        new_game.position = self.position.copy()
         new_game.make_move(move)
         return new_game
 
 class MinimaxAgent:
-    def __init__(self, depth=4):
+    def __init__(self, depth=4, table_size=1 << 20, tablebase=None):
         self.depth = depth
+        # Exact endgame results, if build_tablebase.py has been run
+        self.tablebase = tablebase
+        # Search results, kept across select_move calls
+        self.table = TranspositionTable(table_size)
+        # Two quiet moves per remaining depth that recently caused a cutoff
+        self.killers = [[None, None] for _ in range(depth + 1)]
+        # How often each move caused a cutoff, weighted by depth
+        self.history = {}
+
+    def order_moves(self, moves, tt_move, depth):
+        """Best move from the table first, then killer moves, then by history score."""
+        history = self.history
+        moves.sort(key=lambda move: history.get(move, 0), reverse=True)
+        for killer in reversed(self.killers[depth]):
+            if killer is not None and killer != tt_move and killer in moves:
+                moves.remove(killer)
+                moves.insert(0, killer)
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+    def record_cutoff(self, move, depth):
+        killers = self.killers[depth]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[move] = self.history.get(move, 0) + depth * depth
+
+    def quiescence(self, game, alpha, beta):
+        """
+        Follow capture sequences from a leaf until the side to move has no jump.
+        Captures are forced, so a position with a jump is never scored as it is.
+        A multi-jump keeps the same player to move and is followed the same way.
+        """
+        captures = game.get_capture_moves()
+        if not captures:
+            return game.evaluate()
+
+        maximizing_player = game.current_player == PLAYER_ONE
+        best_value = -math.inf if maximizing_player else math.inf
+        for move in captures:
+            undo = game.make_move(move)
+            eval_score = self.quiescence(game, alpha, beta)
+            game.unmake_move(undo)
+            if maximizing_player:
+                best_value = max(best_value, eval_score)
+                alpha = max(alpha, eval_score)
+            else:
+                best_value = min(best_value, eval_score)
+                beta = min(beta, eval_score)
+            if beta <= alpha:
+                break
+        return best_value
+
+    def search_child(self, game, depth, alpha, beta):
+        """Value of the position after a move, straight from the endgame tables when they cover it."""
+        if self.tablebase is not None:
+            result = self.tablebase.probe(game.position)
+            if result is not None:
+                return tablebase_score(result) * game.current_player
+        return self.minimax(game, depth, alpha, beta, game.current_player == PLAYER_ONE)[0]
 
     def minimax(self, game, depth, alpha, beta, maximizing_player):
-        if depth == 0 or game.is_terminal():
+        if depth == 0:
+            return self.quiescence(game, alpha, beta), None
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
             return game.evaluate(), None
 
-        legal_moves = game.get_legal_moves()
+        # Reuse a stored result for this position
+        key = game.position.hash
+        alpha_start, beta_start = alpha, beta
+        entry = self.table.probe(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, bound, tt_move, tt_value = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return tt_value, tt_move
+                elif bound == LOWER_BOUND:
+                    alpha = max(alpha, tt_value)
+                elif bound == UPPER_BOUND:
+                    beta = min(beta, tt_value)
+                if beta <= alpha:
+                    return tt_value, tt_move
+        legal_moves = self.order_moves(legal_moves, tt_move, depth)
+
         if maximizing_player:
             max_eval = -math.inf
             best_move = None
             for move in legal_moves:
-                new_game = game.get_next_state(move)
-                eval_score, _ = self.minimax(new_game, depth - 1, alpha, beta, False)
+                undo = game.make_move(move)
+                eval_score = self.search_child(game, depth - 1, alpha, beta)
+                game.unmake_move(undo)
                 if eval_score > max_eval:
                     max_eval = eval_score
                     best_move = move
                 alpha = max(alpha, eval_score)
                 if beta <= alpha:
+                    self.record_cutoff(move, depth)
                     break
-            return max_eval, best_move
+            best_value = max_eval
         else:
             min_eval = math.inf
             best_move = None
             for move in legal_moves:
-                new_game = game.get_next_state(move)
-                eval_score, _ = self.minimax(new_game, depth - 1, alpha, beta, True)
+                undo = game.make_move(move)
+                eval_score = self.search_child(game, depth - 1, alpha, beta)
+                game.unmake_move(undo)
                 if eval_score < min_eval:
                     min_eval = eval_score
                     best_move = move
                 beta = min(beta, eval_score)
                 if beta <= alpha:
+                    self.record_cutoff(move, depth)
                     break
-            return min_eval, best_move
+            best_value = min_eval
+
+        # Classify against the window this node was called with, not the narrowed one
+        if best_value <= alpha_start:
+            bound = UPPER_BOUND
+        elif best_value >= beta_start:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.table.store(key, depth, bound, best_move, best_value)
+        return best_value, best_move
 
     def select_move(self, game):
-        _, best_move = self.minimax(game, self.depth, -math.inf, math.inf, True)
+        """
+        Search one ply deeper at a time up to self.depth.
+        Every iteration tries the previous iteration's best moves first.
+        Player 1 maximizes the evaluation and Player 2 minimizes it.
+        """
+        self.table.new_search()
+        if len(self.killers) <= self.depth:
+            self.killers = [[None, None] for _ in range(self.depth + 1)]
+        best_move = None
+        for depth in range(1, self.depth + 1):
+            _, best_move = self.minimax(game, depth, -math.inf, math.inf, game.current_player == PLAYER_ONE)
         return best_move
 
 def draw_board(board):
@@ -179,7 +252,7 @@ def draw_board(board):
 
 def main():
     game = CheckersGame()
-    agent = MinimaxAgent(depth=4)
+    agent = MinimaxAgent(depth=4, tablebase=load_tablebase())
 
     while not game.is_terminal():
         img = draw_board(game.board)
@@ -196,10 +269,10 @@ def main():
     print("Game Over!")
 
     #print which player won the game
-    final_score = game.evaluate()
-    if final_score > 0:
+    winner = game.who_won()
+    if winner == PLAYER_ONE:
         print("Player 1 (Red) wins!")
-    elif final_score < 0:
+    elif winner == PLAYER_TWO:
         print("Player 2 (Blue) wins!")
     else:
         print("It's a draw!")
@@ -0,0 +1,170 @@
+# Batched random self-play for checkers
+#
+# B games are played at the same time with the rules of SimpleCheckers:
+# captures are forced, men are promoted on the far row, and after a jump the
+# same player moves again while the jumping piece can capture once more. Every
+# game is four uint64 bitboards of the 32 playable squares (the
+# layout of checkers_bitboard), so one ply of all B games is a few NumPy
+# operations per direction instead of B trips through Python.
+
+import argparse
+import time
+
+import numpy as np
+
+from checkers_bitboard import (BitboardCheckers, PLAYER_ONE, PLAYER_TWO, FORWARD, REVERSE, STEP, STEP_GROUPS,
+                               FULL_MASK, PROMOTION_ROWS)
+
+MAX_PLIES = 300  # Games still running after this many plies are draws
+
+ONE = np.uint64(1)
+FULL = np.uint64(FULL_MASK)
+BIT_INDEX = np.arange(32, dtype=np.uint64)
+# Masked shifts of every direction, see checkers_bitboard.STEP_GROUPS
+SHIFTS = [[(np.uint64(group), delta > 0, np.uint64(abs(delta))) for group, delta in STEP_GROUPS[d]]
+          for d in range(4)]
+# BACK[d][s]: square one step behind s when moving in direction d
+BACK = np.array([[max(STEP[REVERSE[d]][s], 0) for s in range(32)] for d in range(4)], dtype=np.uint64)
+# Side whose men may move in each direction
+MAN_SIDE = np.array([0 if d in FORWARD[0] else 1 for d in range(4)])
+PROMOTION = np.array(PROMOTION_ROWS, dtype=np.uint64)
+
+default_rng = np.random.default_rng()
+
+
+def shift(masks, direction):
+    """ Vectorized checkers_bitboard.shift over an array of bitboards. """
+    moved = np.zeros_like(masks)
+    for group, left, amount in SHIFTS[direction]:
+        if left:
+            moved |= (masks & group) << amount
+        else:
+            moved |= (masks & group) >> amount
+    return moved
+
+
+def move_masks(men, kings, sides):
+    """
+    Landing squares of the legal moves of every game, one bitboard per direction.
+    Returns an (n, 4) array and whether each game's moves are captures.
+    """
+    rows = np.arange(len(sides))
+    own_men, own_kings = men[rows, sides], kings[rows, sides]
+    opponents = men[rows, 1 - sides] | kings[rows, 1 - sides]
+    empty = FULL & ~(own_men | own_kings | opponents)
+
+    jumps = np.zeros((len(sides), 4), dtype=np.uint64)
+    steps = np.zeros((len(sides), 4), dtype=np.uint64)
+    for d in range(4):
+        movers = own_kings | np.where(sides == MAN_SIDE[d], own_men, np.uint64(0))
+        steps[:, d] = shift(movers, d) & empty
+        jumps[:, d] = shift(shift(movers, d) & opponents, d) & empty
+    captures = (jumps != 0).any(axis=1)
+    return np.where(captures[:, None], jumps, steps), captures
+
+
+def apply_moves(men, kings, sides, games, directions, targets, captures):
+    """
+    Play one move in each of the given games, in place. A move is the
+    direction and landing square picked from move_masks.
+    """
+    side = sides[games]
+    behind = BACK[directions, targets]
+    sources = np.where(captures, BACK[directions, behind], behind)
+    source_bits, target_bits = ONE << sources, ONE << targets
+    captured_bits = np.where(captures, ONE << behind, np.uint64(0))
+
+    # Move the piece and remove the captured one
+    own_men, own_kings = men[games, side], kings[games, side]
+    moved_king = (own_kings & source_bits) != 0
+    flip_bits = source_bits | target_bits
+    own_kings = np.where(moved_king, own_kings ^ flip_bits, own_kings)
+    own_men = np.where(moved_king, own_men, own_men ^ flip_bits)
+    men[games, 1 - side] &= ~captured_bits
+    kings[games, 1 - side] &= ~captured_bits
+
+    # The same player goes on while the piece that jumped can jump again
+    again = np.zeros(len(games), dtype=bool)
+    if captures.any():
+        opponents = men[games, 1 - side] | kings[games, 1 - side]
+        empty = FULL & ~(own_men | own_kings | opponents)
+        for d in range(4):
+            movers = np.where(moved_king | (side == MAN_SIDE[d]), target_bits, np.uint64(0))
+            again |= (shift(shift(movers, d) & opponents, d) & empty) != 0
+        again &= captures
+
+    # Promote to king when the turn ends on the far row
+    promoted = ~again & ~moved_king & ((target_bits & PROMOTION[side]) != 0)
+    own_men = np.where(promoted, own_men ^ target_bits, own_men)
+    own_kings = np.where(promoted, own_kings | target_bits, own_kings)
+    men[games, side] = own_men
+    kings[games, side] = own_kings
+    sides[games] = np.where(again, side, 1 - side)
+
+
+def batch_random_games(n, position=None, max_plies=MAX_PLIES, rng=None):
+    """
+    Play n random games, from a BitboardCheckers position or the start.
+    Returns the winner of each game (PLAYER_ONE, PLAYER_TWO or 0 for a game
+    cut off by max_plies) as an int8 array and the plies each game lasted.
+    """
+    if rng is None:
+        rng = default_rng
+    if position is None:
+        position = BitboardCheckers()
+    men = np.array([position.men] * n, dtype=np.uint64)
+    kings = np.array([position.kings] * n, dtype=np.uint64)
+    sides = np.full(n, position.side())
+    winners = np.zeros(n, dtype=np.int8)
+    plies = np.full(n, max_plies)
+    games = np.arange(n)  # Games that are still running
+
+    for ply in range(max_plies):
+        side = sides[games]
+        moves, captures = move_masks(men[games], kings[games], side)
+
+        # A player without moves loses
+        stuck = (moves == 0).all(axis=1)
+        if stuck.any():
+            winners[games[stuck]] = np.where(side[stuck] == 0, PLAYER_TWO, PLAYER_ONE)
+            plies[games[stuck]] = ply
+            keep = ~stuck
+            games, side, moves, captures = games[keep], side[keep], moves[keep], captures[keep]
+            if len(games) == 0:
+                break
+
+        # Random legal move: the highest random key among all (direction, square) pairs
+        bits = ((moves[:, :, None] >> BIT_INDEX) & ONE).astype(bool)
+        keys = rng.random(bits.shape)
+        keys[~bits] = -1.0
+        choice = keys.reshape(len(games), -1).argmax(axis=1)
+        directions, targets = choice // 32, (choice % 32).astype(np.uint64)
+
+        apply_moves(men, kings, sides, games, directions, targets, captures)
+
+    return winners, plies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play random checkers games in batches and report games/sec.")
+    parser.add_argument("--games", type=int, default=10000, help="Total number of games.")
+    parser.add_argument("--batch", type=int, default=1000, help="Games played together.")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES, help="Plies after which a game is a draw.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = {PLAYER_ONE: 0, PLAYER_TWO: 0, 0: 0}
+    played = 0
+    while played < args.games:
+        winners, _ = batch_random_games(min(args.batch, args.games - played), max_plies=args.max_plies)
+        for winner, count in zip(*np.unique(winners, return_counts=True)):
+            results[int(winner)] += int(count)
+        played += len(winners)
+    elapsed = time.perf_counter() - start
+
+    print(f"Player 1 wins: {results[PLAYER_ONE]}, Player 2 wins: {results[PLAYER_TWO]}, draws: {results[0]}")
+    print(f"{played} games in {elapsed:.1f}s, {played / elapsed:.0f} games/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# Endgame tablebase for checkers
+#
+# Every material signature (Player 1 men, Player 1 kings, Player 2 men,
+# Player 2 kings) has its own file in checkers/tablebase, written offline by
+# build_tablebase.py:
+#
+#   header: magic b"CKTB", format version (uint16), signature (4 x uint8), positions (uint32)
+#   body:   one int8 result per position
+#
+# Tables only hold positions with Player 1 to move. Turning the board by 180
+# degrees maps square s to 31 - s, so a position with Player 2 to move becomes
+# one with Player 1 to move once the colours are swapped as well.
+#
+# Results are seen by the side to move: 0 is a draw, n > 0 a win in n plies
+# and -(n + 1) a loss in n plies. Positions are numbered by ranking the squares
+# of each kind of piece among the squares the earlier kinds left free, so an
+# index is computed directly. The files are memory-mapped and only the pages
+# that are probed are read.
+
+import mmap
+import os
+import re
+import struct
+
+from checkers_bitboard import PLAYER_ONE, popcount, squares
+
+try:
+    from math import comb
+except ImportError:  # Python < 3.8
+    def comb(n, k):
+        if k < 0 or k > n:
+            return 0
+        result = 1
+        for i in range(min(k, n - k)):
+            result = result * (n - i) // (i + 1)
+        return result
+
+MAGIC = b"CKTB"
+VERSION = 1
+HEADER = struct.Struct("<4sH4BI")
+RESULT = struct.Struct("<b")
+DEFAULT_TABLEBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebase")
+TABLE_NAME = re.compile(r"^tb_(\d)(\d)(\d)(\d)\.bin$")
+
+# Score of a won position for minimax, above any material evaluation
+TABLEBASE_WIN = 10 ** 6
+
+
+def table_path(directory, signature):
+    return os.path.join(directory, "tb_{}{}{}{}.bin".format(*signature))
+
+
+def flip(mask):
+    """ Turn a bitboard by 180 degrees, square s goes to 31 - s. """
+    return int(format(mask, "032b")[::-1], 2)
+
+
+def oriented_pieces(position):
+    """ (men, kings, opponent men, opponent kings) seen with the side to move as Player 1. """
+    if position.turn == PLAYER_ONE:
+        return position.men[0], position.kings[0], position.men[1], position.kings[1]
+    return flip(position.men[1]), flip(position.kings[1]), flip(position.men[0]), flip(position.kings[0])
+
+
+def signature_of(pieces):
+    return tuple(popcount(mask) for mask in pieces)
+
+
+def table_size(signature):
+    size, free = 1, 32
+    for count in signature:
+        size *= comb(free, count)
+        free -= count
+    return size
+
+
+def position_index(pieces):
+    """ Index of a position in its table, each kind of piece ranked among the free squares. """
+    index, taken = 0, 0
+    for mask in pieces:
+        free = 32 - popcount(taken)
+        rank = 0
+        for i, s in enumerate(squares(mask)):
+            rank += comb(s - popcount(taken & ((1 << s) - 1)), i + 1)
+        index = index * comb(free, popcount(mask)) + rank
+        taken |= mask
+    return index
+
+
+def tablebase_score(result):
+    """ Minimax score of a table result for the side to move, shorter wins score higher. """
+    if result > 0:
+        return TABLEBASE_WIN - result
+    if result < 0:
+        return -(TABLEBASE_WIN + result + 1)
+    return 0
+
+
+class Tablebase:
+    def __init__(self, directory=DEFAULT_TABLEBASE_DIR):
+        self.directory = directory
+        # Tables are opened on first use, None marks a signature without a file
+        self.tables = {}
+        self.max_pieces = 0
+        for name in os.listdir(directory):
+            match = TABLE_NAME.match(name)
+            if match:
+                self.max_pieces = max(self.max_pieces, sum(int(count) for count in match.groups()))
+
+    def close(self):
+        for data in self.tables.values():
+            if data is not None:
+                data.close()
+        self.tables = {}
+
+    def table(self, signature):
+        """
+        Memory-mapped table of a signature, or None. An empty, truncated or
+        foreign file is treated like a missing one, so a bad file only costs
+        the search its exact results.
+        """
+        if signature not in self.tables:
+            path = table_path(self.directory, signature)
+            data = None
+            positions = table_size(signature)
+            if os.path.exists(path) and os.path.getsize(path) == HEADER.size + positions:
+                with open(path, "rb") as table_file:
+                    magic, version, *stored, size = HEADER.unpack(table_file.read(HEADER.size))
+                    if (magic == MAGIC and version == VERSION and tuple(stored) == signature
+                            and size == positions):
+                        data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.tables[signature] = data
+        return self.tables[signature]
+
+    def probe_pieces(self, pieces):
+        """ Result for oriented pieces with the side to move as Player 1, or None. """
+        signature = signature_of(pieces)
+        if signature[0] + signature[1] == 0:
+            return -1  # No pieces left to move, lost
+        if sum(signature) > self.max_pieces:
+            return None
+        data = self.table(signature)
+        if data is None:
+            return None
+        return RESULT.unpack_from(data, HEADER.size + position_index(pieces))[0]
+
+    def probe(self, position):
+        """ Result of a BitboardCheckers position for the side to move, or None. """
+        if position.piece_count(0) + position.piece_count(1) > self.max_pieces:
+            return None
+        return self.probe_pieces(oriented_pieces(position))
+
+
+# Open the tablebase if build_tablebase.py has been run, otherwise return None
+def load_tablebase(directory=DEFAULT_TABLEBASE_DIR):
+    if not os.path.isdir(directory):
+        return None
+    tablebase = Tablebase(directory)
+    if tablebase.max_pieces == 0:
+        return None
+    return tablebase
+
+
+# Write the results of one signature, indexed by position_index
+def write_table(directory, signature, results):
+    os.makedirs(directory, exist_ok=True)
+    with open(table_path(directory, signature), "wb") as table_file:
+        table_file.write(HEADER.pack(MAGIC, VERSION, *signature, len(results)))
+        table_file.write(bytes(result & 0xFF for result in results))
@@ -0,0 +1,48 @@
+# Transposition table for the checkers MinimaxAgent
+#
+# Keys are BitboardCheckers.hash: a Zobrist hash over men and kings of both
+# sides on the 32 playable squares, with ZOBRIST_PLAYER_TWO mixed in while
+# Player 2 is to move. A multi-jump keeps the same player to move, so the
+# middle of a jump sequence hashes differently from the same pieces with the
+# turn passed.
+
+# How a stored value relates to the true value of the position
+EXACT = 0  # Searched with the full window, the value is exact
+LOWER_BOUND = 1  # The value reached beta, the position is worth this or more
+UPPER_BOUND = 2  # The value stayed at or below alpha, worth this or less
+
+
+class TranspositionTable:
+    """
+    One entry per slot, at hash % size. The agent keeps the table for the
+    whole game, so entries carry the generation of the select_move call that
+    wrote them. Within one call a slot keeps the deeper of two colliding
+    searches; an entry written for an earlier move is still probed, but any
+    new result may take its slot.
+    """
+
+    def __init__(self, size=1 << 20):
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+
+    def new_search(self):
+        """ Mark the entries written so far as belonging to earlier moves. """
+        self.generation += 1
+
+    def clear(self):
+        self.slots = [None] * self.size
+
+    def probe(self, key):
+        """ Stored (depth, bound, best move, value) of a position hash, or None. """
+        entry = self.slots[key % self.size]
+        if entry is None or entry[0] != key:
+            return None
+        return entry[1:5]
+
+    def store(self, key, depth, bound, move, value):
+        """ Record a search result unless the slot holds a deeper one from this move. """
+        index = key % self.size
+        entry = self.slots[index]
+        if entry is None or entry[0] == key or entry[5] != self.generation or depth >= entry[1]:
+            self.slots[index] = (key, depth, bound, move, value, self.generation)
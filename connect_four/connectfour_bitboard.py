@@ -0,0 +1,172 @@
+# Bitboard position for Connect Four
+#
+# Each player's stones live in one integer mask. Bits are laid out column by
+# column, with one extra sentinel bit on top of every column so that shifted
+# masks never wrap from one column into the next:
+#
+#   6 13 20 27 34 41 48   <- sentinel row (always empty)
+#   5 12 19 26 33 40 47
+#   4 11 18 25 32 39 46
+#   3 10 17 24 31 38 45
+#   2  9 16 23 30 37 44
+#   1  8 15 22 29 36 43
+#   0  7 14 21 28 35 42   <- row 0 is the first row a piece falls into
+
+ROWS = 6  # Number of rows in the board
+COLS = 7  # Number of columns
+PLAYER_1 = 1  # First player, always moves first
+PLAYER_2 = 2  # Second player
+EMPTY = 0  # Empty spot in the grid
+WIN_LENGTH = 4  # For winning (4 connected pieces required)
+
+# Results of dropping a piece
+IN_PROGRESS = 0  # The game goes on
+WINNING_MOVE = 1  # The piece completed four in a row
+BOARD_FULL = 2  # The piece filled the last cell without winning
+
+COL_HEIGHT = ROWS + 1  # Bits used per column, including the sentinel
+BOTTOM_MASK = sum(1 << (c * COL_HEIGHT) for c in range(COLS))
+COLUMN_MASK = (1 << COL_HEIGHT) - 1
+BOARD_MASK = BOTTOM_MASK * ((1 << ROWS) - 1)
+CENTER_MASK = ((1 << ROWS) - 1) << (COLS // 2 * COL_HEIGHT)
+
+# Shift amounts for vertical, horizontal and the two diagonal directions
+DIRECTIONS = (1, COL_HEIGHT, COL_HEIGHT - 1, COL_HEIGHT + 1)
+
+# Bit of the sentinel row in each column, reached when the column is full
+TOP_BITS = [c * COL_HEIGHT + ROWS for c in range(COLS)]
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(mask):
+        return bin(mask).count("1")
+
+
+# Bit index of a cell
+def cell_bit(row, col):
+    return col * COL_HEIGHT + row
+
+
+# Function to list the mask of every window of four cells that can win
+def make_windows():
+    windows = []
+    for r in range(ROWS):
+        for c in range(COLS):
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (-1, 1)):
+                end_r, end_c = r + dr * (WIN_LENGTH - 1), c + dc * (WIN_LENGTH - 1)
+                if 0 <= end_r < ROWS and 0 <= end_c < COLS:
+                    windows.append(sum(1 << cell_bit(r + dr * i, c + dc * i) for i in range(WIN_LENGTH)))
+    return windows
+
+
+WINDOW_MASKS = make_windows()  # All 69 winning windows
+# Indices of the windows that pass through each bit
+WINDOWS_BY_BIT = [tuple(w for w, window in enumerate(WINDOW_MASKS) if window >> bit & 1)
+                  for bit in range(COLS * COL_HEIGHT)]
+
+
+# Check a stone mask for four in a row with shift-and-AND
+def connected_four(mask):
+    for shift in DIRECTIONS:
+        pairs = mask & (mask >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+# Reflect a mask left to right, column c swaps with column COLS - 1 - c
+def mirror(mask):
+    mirrored = 0
+    for c in range(COLS):
+        mirrored |= ((mask >> (c * COL_HEIGHT)) & COLUMN_MASK) << ((COLS - 1 - c) * COL_HEIGHT)
+    return mirrored
+
+
+class Position:
+    __slots__ = ("masks", "heights", "moves", "counts")
+
+    def __init__(self):
+        # Stones of PLAYER_1 and PLAYER_2
+        self.masks = [0, 0]
+        # Bit index of the next free cell in every column
+        self.heights = [c * COL_HEIGHT for c in range(COLS)]
+        # Number of pieces played so far, its parity gives the side to move
+        self.moves = 0
+        # Pieces of each player inside every winning window
+        self.counts = [[0] * len(WINDOW_MASKS), [0] * len(WINDOW_MASKS)]
+
+    def copy(self):
+        new = Position.__new__(Position)
+        new.masks = self.masks[:]
+        new.heights = self.heights[:]
+        new.moves = self.moves
+        new.counts = [self.counts[0][:], self.counts[1][:]]
+        return new
+
+    # Piece of the player whose turn it is
+    def current_piece(self):
+        return PLAYER_2 if self.moves & 1 else PLAYER_1
+
+    # Check if the column is not full
+    def can_play(self, col):
+        return self.heights[col] != TOP_BITS[col]
+
+    # First empty row in a column
+    def next_open_row(self, col):
+        return self.heights[col] - col * COL_HEIGHT
+
+    # Drop the side to move's piece into a column
+    # Only the windows through the new piece can complete a four, so the
+    # result (IN_PROGRESS, WINNING_MOVE or BOARD_FULL) needs no board scan
+    def play(self, col):
+        side = self.moves & 1
+        bit = self.heights[col]
+        self.masks[side] |= 1 << bit
+        counts = self.counts[side]
+        won = False
+        for w in WINDOWS_BY_BIT[bit]:
+            count = counts[w] + 1
+            counts[w] = count
+            if count == WIN_LENGTH:
+                won = True
+        self.heights[col] = bit + 1
+        self.moves += 1
+        if won:
+            return WINNING_MOVE
+        if self.moves == ROWS * COLS:
+            return BOARD_FULL
+        return IN_PROGRESS
+
+    # Take back the last piece dropped into a column
+    def undo(self, col):
+        self.moves -= 1
+        side = self.moves & 1
+        bit = self.heights[col] - 1
+        self.heights[col] = bit
+        self.masks[side] ^= 1 << bit
+        counts = self.counts[side]
+        for w in WINDOWS_BY_BIT[bit]:
+            counts[w] -= 1
+
+    def valid_columns(self):
+        return [c for c in range(COLS) if self.heights[c] != TOP_BITS[c]]
+
+    def has_won(self, piece):
+        return connected_four(self.masks[piece - 1])
+
+    # Unique key of the position: PLAYER_1's stones plus the column heights
+    def key(self):
+        return self.masks[0] + (self.masks[0] | self.masks[1]) + BOTTOM_MASK
+
+    def is_full(self):
+        return self.moves == ROWS * COLS
+
+    # Piece at a cell, used for drawing
+    def cell(self, row, col):
+        bit = 1 << cell_bit(row, col)
+        if self.masks[0] & bit:
+            return PLAYER_1
+        if self.masks[1] & bit:
+            return PLAYER_2
+        return EMPTY
@@ -1,7 +1,14 @@
+import argparse
 import numpy as np
 import cv2
 import math
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from connectfour_bitboard import Position, IN_PROGRESS
+from connectfour_opening_book import load_opening_book
+from connectfour_rollouts import batch_random_playouts
 
 # Constants
 ROWS = 6  # Total rows on the board
@@ -12,142 +19,151 @@ EMPTY = 0  # Empty cell
 SQUARE = 100  # Size of each square in the GUI
 RADIUS = SQUARE // 2 - 5  # Circle radius
 WIN_LENGTH = 4  # Length to win the game (4 in a row)
+ROLLOUT_BATCH = 1000  # Random games played together in every MCTS iteration
+MCTS_WORKERS = 1  # Independent search trees run in parallel, 1 searches one tree reused between moves
 
 # Create an empty game board
 def make_board():
-    return np.zeros((ROWS, COLS), dtype=int)
+    return Position()
 
-# Drop the piece in the selected column
-def place_piece(board, row, col, player):
-    # Put the player's piece at the right spot
-    board[row][col] = player
+# Drop the piece of the player to move in the selected column
+# Returns IN_PROGRESS, WINNING_MOVE or BOARD_FULL
+def place_piece(board, col):
+    return board.play(col)
 
 # Check if the column has space to place a piece
 def valid_column(board, col):
-    # Topmost row should be empty
-    return board[ROWS - 1][col] == EMPTY
+    return board.can_play(col)
 
 # Find the lowest empty row in a column
 def find_empty_row(board, col):
-    for r in range(ROWS):
-        if board[r][col] == EMPTY:
-            return r  # Return the first empty spot
+    return board.next_open_row(col)
 
 # Check if a player has won
 def has_won(board, player):
-    # Check horizontal win
-    for c in range(COLS - 3):
-        for r in range(ROWS):
-            if all(board[r, c+i] == player for i in range(WIN_LENGTH)):
-                return True
-
-    # Check vertical win
-    for c in range(COLS):
-        for r in range(ROWS - 3):
-            if all(board[r+i, c] == player for i in range(WIN_LENGTH)):
-                return True
-
-    # Check diagonals (positive slope)
-    for c in range(COLS - 3):
-        for r in range(ROWS - 3):
-            if all(board[r+i, c+i] == player for i in range(WIN_LENGTH)):
-                return True
-
-    # Check diagonals (negative slope)
-    for c in range(COLS - 3):
-        for r in range(3, ROWS):
-            if all(board[r-i, c+i] == player for i in range(WIN_LENGTH)):
-                return True
-
-    return False
+    return board.has_won(player)
 
 # Check if the game is over (win or draw)
 def is_game_over(board):
-    return has_won(board, PLAYER1) or has_won(board, PLAYER2) or len(find_valid_cols(board)) == 0
+    return has_won(board, PLAYER1) or has_won(board, PLAYER2) or board.is_full()
 
 # Find all valid columns where a move can be made
 def find_valid_cols(board):
-    valid_cols = []
-    for col in range(COLS):
-        if valid_column(board, col):
-            valid_cols.append(col)
-    return valid_cols
-
-# Simulate a random game to see who wins
-def random_game_sim(board, player):
-    temp_board = board.copy()
-    current_player = player
-
-    while not is_game_over(temp_board):
-        valid_cols = find_valid_cols(temp_board)
-        if not valid_cols:
-            break  # Stop if no moves left
-        # Pick a random column
-        col = random.choice(valid_cols)
-        row = find_empty_row(temp_board, col)
-        place_piece(temp_board, row, col, current_player)
-
-        if has_won(temp_board, current_player):
-            return current_player  # Return the winner
-
-        # Switch player turn
-        current_player = PLAYER1 if current_player == PLAYER2 else PLAYER2
-
-    return 0  # Draw
+    return board.valid_columns()
 
 # MCTS Node Class
 class MCTSNode:
-    def __init__(self, board, player):
+    def __init__(self, board, parent=None, col=None, terminal=None):
+        # Position after col was played, each node keeps its own copy
         self.board = board
-        self.player = player
+        self.parent = parent
+        self.col = col
+        # Player who dropped the last piece, wins are counted for them
+        self.player = PLAYER1 if board.current_piece() == PLAYER2 else PLAYER2
         self.visits = 0
-        self.wins = 0
+        self.wins = 0.0
         # Stores child nodes
         self.children = {}
+        # Children get this from the result of their move, only a root scans the board
+        self.terminal = is_game_over(board) if terminal is None else terminal
+        # Columns that have no child node yet
+        self.untried_cols = [] if self.terminal else find_valid_cols(board)
 
     def is_fully_expanded(self):
-        return len(self.children) == len(find_valid_cols(self.board))
+        return not self.untried_cols
 
     def best_child(self, explore=1.0):
-        scores = [
-            (child.wins / (child.visits + 1e-6)) + explore * math.sqrt(math.log(self.visits + 1) / (child.visits + 1e-6))
-            for child in self.children.values()
-        ]
-        return list(self.children.values())[np.argmax(scores)]
+        log_visits = math.log(self.visits)
+        return max(self.children.values(),
+                   key=lambda child: child.wins / child.visits + explore * math.sqrt(log_visits / child.visits))
+
+    # Add a child node for one random untried column
+    def expand(self):
+        col = self.untried_cols.pop(random.randrange(len(self.untried_cols)))
+        next_board = self.board.copy()
+        status = place_piece(next_board, col)
+        child = MCTSNode(next_board, self, col, status != IN_PROGRESS)
+        self.children[col] = child
+        return child
+
+    # Update this node and all its ancestors with a batch of rollout winners
+    def backpropagate(self, winners):
+        draws = np.count_nonzero(winners == EMPTY)
+        node = self
+        while node:
+            node.visits += 1
+            # Fraction of the batch won by the player who moved into the node
+            node.wins += (np.count_nonzero(winners == node.player) + 0.5 * draws) / len(winners)
+            node = node.parent
+
+# Keep the subtree below the chosen column as the root of the next search
+def advance_tree(root, col):
+    child = root.children.get(col) if root else None
+    if child is not None:
+        # Drop the link so the rest of the old tree can be freed
+        child.parent = None
+    return child
 
 # Monte Carlo Tree Search (MCTS) to decide the best move
-def mcts_search(board, player, iterations=1000):
-    root = MCTSNode(board, player)
-
-    for _ in range(iterations):
+# Searches for the player to move on board, root may be a tree from advance_tree
+# deadline is a time.time() value after which the search stops early
+# At least one iteration always runs, so the root has a column to choose
+def mcts_search(board, iterations=1000, rollouts=ROLLOUT_BATCH, root=None, deadline=None, rng=None):
+    if root is None:
+        root = MCTSNode(board.copy())
+
+    for i in range(max(iterations, 1)):
+        if i > 0 and deadline is not None and time.time() > deadline:
+            break
         node = root
-        sim_board = board.copy()
 
         # Selection phase: Move to best child until unexpanded node
-        while not is_game_over(sim_board) and node.is_fully_expanded():
+        while not node.terminal and node.is_fully_expanded():
             node = node.best_child()
 
         # Expansion phase: Add a child node for a valid move
-        valid_cols = find_valid_cols(sim_board)
-        if valid_cols:
-            col = random.choice(valid_cols)
-            row = find_empty_row(sim_board, col)
-            next_board = sim_board.copy()
-            place_piece(next_board, row, col, player)
-            node.children[col] = MCTSNode(next_board, PLAYER1 if player == PLAYER2 else PLAYER2)
-
-        # Simulation phase: Random game to determine winner
-        winner = random_game_sim(sim_board, player)
-
-        # Backpropagation phase: Update visit and win stats
-        while node:
-            node.visits += 1
-            if node.player == winner:
-                node.wins += 1
-            # Parent relationship not implemented
-            node = None
-
-    return max(root.children, key=lambda c: root.children[c].wins / (root.children[c].visits + 1e-6))
+        if not node.terminal:
+            node = node.expand()
+
+        # Simulation phase: A batch of random games to determine winners
+        winners = batch_random_playouts(node.board, rollouts, rng)
+
+        # Backpropagation phase: Update visit and win stats up to the root
+        node.backpropagate(winners)
+
+    # The most visited column is the most reliable choice
+    return max(root.children, key=lambda c: root.children[c].visits)
+
+# Run one independent search in a worker process
+# Returns the visits and wins of every root child
+def mcts_worker(board, iterations, rollouts, seed, deadline):
+    random.seed(seed)
+    root = MCTSNode(board.copy())
+    mcts_search(board, iterations, rollouts, root, deadline, np.random.default_rng(seed))
+    return {col: (child.visits, child.wins) for col, child in root.children.items()}
+
+# Root-parallel MCTS: one tree per worker with its own seed, root statistics merged
+# iterations is the budget of every worker, time_limit (seconds) is shared by all of them
+def parallel_mcts_search(board, workers=MCTS_WORKERS, iterations=1000, rollouts=ROLLOUT_BATCH,
+                         time_limit=None, executor=None):
+    deadline = time.time() + time_limit if time_limit is not None else None
+    seeds = [random.getrandbits(63) for _ in range(workers)]
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(mcts_worker, board, iterations, rollouts, seed, deadline) for seed in seeds]
+        visits, wins = {}, {}
+        for future in futures:
+            for col, (child_visits, child_wins) in future.result().items():
+                visits[col] = visits.get(col, 0) + child_visits
+                wins[col] = wins.get(col, 0.0) + child_wins
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    # Most visits over all trees, ties go to the column with more wins
+    return max(visits, key=lambda col: (visits[col], wins[col]))
 
 # Draw the Connect Four game board
 def draw_board(board):
@@ -157,44 +173,69 @@ def draw_board(board):
         for r in range(ROWS):
             # Black for empty
             color = (0, 0, 0)
-            if board[r][c] == PLAYER1:
+            piece = board.cell(r, c)
+            if piece == PLAYER1:
                 color = (255, 0, 0)
-            elif board[r][c] == PLAYER2:
+            elif piece == PLAYER2:
                 color = (255, 255, 0)
             cv2.circle(image, (c * SQUARE + SQUARE // 2, r * SQUARE + SQUARE // 2), RADIUS, color, -1)
     cv2.imshow("Connect Four", image)
     cv2.waitKey(500)
 
 
-# Game variables
-game_board = make_board()
-# 0 for Player 1, 1 for Player 2
-turn = 0
-
 # Show the board
-def show_game():
-    draw_board(game_board)
-
-# Main game loop
-while not is_game_over(game_board):
-    show_game()
-
-    # AI move using MCTS
-    if turn == 0:
-        col = mcts_search(game_board, PLAYER1)
-    else:
-        col = mcts_search(game_board, PLAYER2)
-
-    if valid_column(game_board, col):
-        row = find_empty_row(game_board, col)
-        place_piece(game_board, row, col, PLAYER1 if turn == 0 else PLAYER2)
-
-        # Check for a win
-        if has_won(game_board, PLAYER1 if turn == 0 else PLAYER2):
-            show_game()
-            print(f"Player {1 if turn == 0 else 2} wins!")
-            break
-        # Switch turns
-        turn = (turn + 1) % 2
-
-cv2.destroyAllWindows()
+def show_game(board):
+    draw_board(board)
+
+def main():
+    parser = argparse.ArgumentParser(description="Play Connect Four with MCTS.")
+    parser.add_argument("--workers", type=int, default=MCTS_WORKERS,
+                        help="Search trees run in parallel processes. With 1 the tree is reused between moves.")
+    args = parser.parse_args()
+
+    # Game variables
+    game_board = make_board()
+    # Search tree reused between moves
+    search_tree = None
+    # Worker processes for root-parallel search, kept for the whole game
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    # Precomputed opening moves, if build_opening_book.py has been run
+    opening_book = load_opening_book()
+    # 0 for Player 1, 1 for Player 2
+    turn = 0
+
+    # Main game loop
+    while not is_game_over(game_board):
+        show_game(game_board)
+
+        # Play straight from the book while the position is in it
+        book_entry = opening_book.probe(game_board) if opening_book is not None else None
+        if book_entry is not None:
+            col = book_entry[0]
+        elif executor is not None:
+            # AI move using one MCTS tree per worker process
+            col = parallel_mcts_search(game_board, args.workers, executor=executor)
+        else:
+            # AI move using MCTS
+            if search_tree is None:
+                search_tree = MCTSNode(game_board.copy())
+            col = mcts_search(game_board, root=search_tree)
+
+        if valid_column(game_board, col):
+            place_piece(game_board, col)
+            search_tree = advance_tree(search_tree, col)
+
+            # Check for a win
+            if has_won(game_board, PLAYER1 if turn == 0 else PLAYER2):
+                show_game(game_board)
+                print(f"Player {1 if turn == 0 else 2} wins!")
+                break
+            # Switch turns
+            turn = (turn + 1) % 2
+
+    if executor is not None:
+        executor.shutdown()
+    cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 import numpy as np
 import cv2
 import math
+import time
+
+from connectfour_bitboard import Position, WINDOWS_BY_BIT, CENTER_MASK, WINNING_MOVE, BOARD_FULL, popcount
+from connectfour_opening_book import load_opening_book
+from connectfour_transposition import TranspositionTable, canonical_key, EXACT, LOWER_BOUND, UPPER_BOUND
 
 # Constants for the game
 ROW_COUNT = 6  # Number of rows in the board
@@ -9,180 +14,257 @@ PLAYER_1 = 1  # Player 1 (AI)
 PLAYER_2 = 2  # Player 2 (AI)
 EMPTY = 0  # Empty spot in the grid
 WINDOW_LENGTH = 4  # For winning (4 connected pieces required)
+MOVE_TIME_LIMIT = 1.0  # Seconds of search per move
+MAX_SEARCH_DEPTH = ROW_COUNT * COLUMN_COUNT  # Deepest iteration ever needed
+WIN_SCORE = 1000000000  # Score of a won position for Player 2
+CENTER_ORDER = [3, 2, 4, 1, 5, 0, 6]  # Center columns take part in more windows
 
+# Search results shared by every minimax call, kept between moves
+transposition_table = TranspositionTable()
+# Two columns per ply that recently caused a cutoff
+killer_moves = [[None, None] for _ in range(MAX_SEARCH_DEPTH + 1)]
+# How often each column caused a cutoff, per player
+history_scores = [[0] * COLUMN_COUNT for _ in range(2)]
 
-# Function to create an empty board
-# Makes a grid with 6 rows and 7 columns, all set to zero
-def make_board():
-    return np.zeros((ROW_COUNT, COLUMN_COUNT), dtype=int)
 
+# Raised inside minimax when the move's time budget runs out
+class SearchTimeout(Exception):
+    pass
 
-# Function to drop a piece in the board at a specific location
-def put_piece(board, row, column, piece):
-    # Puts the piece in the grid
-    board[row][column] = piece
+
+# Function to create an empty board
+# Makes a bitboard position with 6 rows and 7 columns, all empty
+def make_board():
+    return Position()
+
+
+# Function to drop a piece in the board at a specific column
+# Returns how much the move changes calc_score(board, PLAYER_2) and whether
+# it won the game or filled the board
+def put_piece(board, column):
+    side = board.moves & 1
+    counts_1, counts_2 = board.counts
+    deltas = MOVE_DELTAS[side]
+    # Only the windows through the new piece change their score
+    delta = 0
+    for w in WINDOWS_BY_BIT[board.heights[column]]:
+        delta += deltas[counts_1[w]][counts_2[w]]
+    if side == 1 and column == COLUMN_COUNT // 2:
+        delta += 3
+    # Puts the piece of the player to move in the column
+    status = board.play(column)
+    return delta, status
 
 
 # Function to check if a column is not full
 def is_column_valid(board, col):
-    # Checks top row
-    return board[ROW_COUNT - 1][col] == EMPTY
+    return board.can_play(col)
 
 
 # Function to find the first empty row in a column
 def find_next_open_spot(board, col):
-    for r in range(ROW_COUNT):
-        if board[r][col] == EMPTY:
-            return r
+    return board.next_open_row(col)
 
 
 # Function to check if a player has won
 def check_winner(board, piece):
-    # Check horizontal win
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT):
-            if all(board[r, c + i] == piece for i in range(WINDOW_LENGTH)):
-                return True
-
-    # Check vertical win
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT - 3):
-            if all(board[r + i, c] == piece for i in range(WINDOW_LENGTH)):
-                return True
-
-    # Check diagonal win (positive slope)
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT - 3):
-            if all(board[r + i][c + i] == piece for i in range(WINDOW_LENGTH)):
-                return True
-
-    # Check diagonal win (negative slope)
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(3, ROW_COUNT):
-            if all(board[r - i][c + i] == piece for i in range(WINDOW_LENGTH)):
-                return True
-
-    return False
+    return board.has_won(piece)
 
 
 # Function to calculate score of a window for AI evaluation
-def eval_window(window, piece):
+def eval_window(own, opp):
     score = 0
-    # Opponent's piece
-    opp_piece = PLAYER_1 if piece == PLAYER_2 else PLAYER_2
+    empty = WINDOW_LENGTH - own - opp
 
     # Conditions to calculate the score
-    if window.count(piece) == 4:
+    if own == 4:
         score += 100
-    elif window.count(piece) == 3 and window.count(EMPTY) == 1:
+    elif own == 3 and empty == 1:
         score += 5
-    elif window.count(piece) == 2 and window.count(EMPTY) == 2:
+    elif own == 2 and empty == 2:
         score += 2
-    elif window.count(opp_piece) == 3 and window.count(EMPTY) == 1:
+    elif opp == 3 and empty == 1:
         score -= 4
 
     return score
 
 
+# Score of every window by (own pieces, opponent pieces)
+WINDOW_SCORES = [[eval_window(own, opp) if own + opp <= WINDOW_LENGTH else 0 for opp in range(WINDOW_LENGTH + 1)]
+                 for own in range(WINDOW_LENGTH + 1)]
+
+# Change of Player 2's window score when a player adds a piece to a window
+# Indexed by the mover (0 for Player 1, 1 for Player 2), then the window's
+# Player 1 and Player 2 piece counts before the move
+MOVE_DELTAS = [[[WINDOW_SCORES[p2][p1 + 1] - WINDOW_SCORES[p2][p1] if p1 + p2 < WINDOW_LENGTH else 0
+                 for p2 in range(WINDOW_LENGTH + 1)] for p1 in range(WINDOW_LENGTH + 1)],
+               [[WINDOW_SCORES[p2 + 1][p1] - WINDOW_SCORES[p2][p1] if p1 + p2 < WINDOW_LENGTH else 0
+                 for p2 in range(WINDOW_LENGTH + 1)] for p1 in range(WINDOW_LENGTH + 1)]]
+
+
 # Function to calculate the score of the current board for AI decision
 def calc_score(board, piece):
-    score = 0
+    mine = board.counts[piece - 1]
+    theirs = board.counts[2 - piece]
 
     # Score center column
-    center_array = [int(i) for i in list(board[:, COLUMN_COUNT // 2])]
-    center_count = center_array.count(piece)
-    score += center_count * 3
-
-    # Score horizontally
-    for r in range(ROW_COUNT):
-        row_array = [int(i) for i in list(board[r, :])]
-        for c in range(COLUMN_COUNT - 3):
-            window = row_array[c:c + WINDOW_LENGTH]
-            score += eval_window(window, piece)
-
-    # Score vertically
-    for c in range(COLUMN_COUNT):
-        col_array = [int(i) for i in list(board[:, c])]
-        for r in range(ROW_COUNT - 3):
-            window = col_array[r:r + WINDOW_LENGTH]
-            score += eval_window(window, piece)
-
-    # Score diagonally (positive slope)
-    for r in range(ROW_COUNT - 3):
-        for c in range(COLUMN_COUNT - 3):
-            window = [board[r + i][c + i] for i in range(WINDOW_LENGTH)]
-            score += eval_window(window, piece)
-
-    # Score diagonally (negative slope)
-    for r in range(ROW_COUNT - 3):
-        for c in range(COLUMN_COUNT - 3):
-            window = [board[r + 3 - i][c + i] for i in range(WINDOW_LENGTH)]
-            score += eval_window(window, piece)
+    score = popcount(board.masks[piece - 1] & CENTER_MASK) * 3
+
+    # Score every horizontal, vertical and diagonal window
+    for own, opp in zip(mine, theirs):
+        score += WINDOW_SCORES[own][opp]
 
     return score
 
 
 # Function to check if game is over (no moves left or someone won)
 def game_over(board):
-    return check_winner(board, PLAYER_1) or check_winner(board, PLAYER_2) or len(find_valid_columns(board)) == 0
+    return check_winner(board, PLAYER_1) or check_winner(board, PLAYER_2) or board.is_full()
+
+
+# Function to order columns: stored best column, killers, then history and center
+def order_columns(board, tt_col):
+    valid_cols = [col for col in CENTER_ORDER if board.can_play(col)]
+    # Stable sort, so equal history scores keep the center-first order
+    valid_cols.sort(key=history_scores[board.moves & 1].__getitem__, reverse=True)
+    for col in reversed(killer_moves[board.moves]):
+        if col is not None and col != tt_col and col in valid_cols:
+            valid_cols.remove(col)
+            valid_cols.insert(0, col)
+    if tt_col is not None:
+        valid_cols.remove(tt_col)
+        valid_cols.insert(0, tt_col)
+    return valid_cols
+
+
+# Function to remember a column that caused an alpha-beta cutoff
+def record_cutoff(board, col, depth):
+    killers = killer_moves[board.moves]
+    if killers[0] != col:
+        killers[1] = killers[0]
+        killers[0] = col
+    history_scores[board.moves & 1][col] += depth * depth
 
 
 # Minimax algorithm with pruning to decide best move
-def minimax(board, depth, alpha, beta, is_maximizing):
-    valid_cols = find_valid_columns(board)  # Get all valid columns
-    terminal = game_over(board)  # Check if game is over
-
-    # If game over or depth reached, return score
-    if depth == 0 or terminal:
-        if terminal:
-            if check_winner(board, PLAYER_2):
-                return (None, 1000000000)
-            elif check_winner(board, PLAYER_1):
-                return (None, -1000000000)
-            else:  # Draw
-                return (None, 0)
-        else:
-            return (None, calc_score(board, PLAYER_2))
+# board must not be a finished game, wins and draws are scored by the parent
+# score is calc_score(board, PLAYER_2), passed down so leaves need no rescan
+def minimax(board, depth, alpha, beta, is_maximizing, deadline=None, score=None):
+    if score is None:
+        score = calc_score(board, PLAYER_2)
+
+    # If depth reached, return score
+    if depth == 0:
+        return (None, score)
+
+    if deadline is not None and time.perf_counter() > deadline:
+        raise SearchTimeout()
+
+    # Reuse a stored result for this position (or its mirror image)
+    alpha_start, beta_start = alpha, beta
+    key, flipped = canonical_key(board)
+    entry = transposition_table.probe(key, flipped)
+    tt_col = None
+    if entry is not None:
+        entry_depth, bound, tt_col, tt_value = entry
+        if entry_depth >= depth:
+            if bound == EXACT:
+                return tt_col, tt_value
+            elif bound == LOWER_BOUND:
+                alpha = max(alpha, tt_value)
+            elif bound == UPPER_BOUND:
+                beta = min(beta, tt_value)
+            if alpha >= beta:
+                return tt_col, tt_value
+    valid_cols = order_columns(board, tt_col)
 
     if is_maximizing:  # AI's turn to maximize
         value = -math.inf
         best_col = np.random.choice(valid_cols)
         for col in valid_cols:
-            row = find_next_open_spot(board, col)
-            b_copy = board.copy()
-            put_piece(b_copy, row, col, PLAYER_2)
-            new_score = minimax(b_copy, depth - 1, alpha, beta, False)[1]
+            delta, status = put_piece(board, col)
+            try:
+                if status == WINNING_MOVE:
+                    new_score = WIN_SCORE
+                elif status == BOARD_FULL:  # Draw
+                    new_score = 0
+                else:
+                    new_score = minimax(board, depth - 1, alpha, beta, False, deadline, score + delta)[1]
+            finally:
+                # Take the piece back even when the search below times out
+                board.undo(col)
             if new_score > value:
                 value = new_score
                 best_col = col
             alpha = max(alpha, value)
             if alpha >= beta:  # Prune
+                record_cutoff(board, col, depth)
                 break
-        return best_col, value
     else:  # Opponent's turn to minimize
         value = math.inf
         best_col = np.random.choice(valid_cols)
         for col in valid_cols:
-            row = find_next_open_spot(board, col)
-            b_copy = board.copy()
-            put_piece(b_copy, row, col, PLAYER_1)
-            new_score = minimax(b_copy, depth - 1, alpha, beta, True)[1]
+            delta, status = put_piece(board, col)
+            try:
+                if status == WINNING_MOVE:
+                    new_score = -WIN_SCORE
+                elif status == BOARD_FULL:  # Draw
+                    new_score = 0
+                else:
+                    new_score = minimax(board, depth - 1, alpha, beta, True, deadline, score + delta)[1]
+            finally:
+                # Take the piece back even when the search below times out
+                board.undo(col)
             if new_score < value:
                 value = new_score
                 best_col = col
             beta = min(beta, value)
             if alpha >= beta:  # Prune
+                record_cutoff(board, col, depth)
                 break
-        return best_col, value
+
+    # A score at or outside the starting window only bounds the position
+    if value <= alpha_start:
+        bound = UPPER_BOUND
+    elif value >= beta_start:
+        bound = LOWER_BOUND
+    else:
+        bound = EXACT
+    transposition_table.store(key, flipped, depth, bound, best_col, value)
+    return best_col, value
+
+
+# Search one ply deeper at a time until the time budget runs out
+# Each iteration starts from the previous principal variation stored in the table
+def iterative_deepening(board, time_limit=MOVE_TIME_LIMIT, max_depth=MAX_SEARCH_DEPTH):
+    deadline = time.perf_counter() + time_limit
+    is_maximizing = board.current_piece() == PLAYER_2
+    transposition_table.new_search()
+    # Old history still helps ordering, but should not dominate this move
+    for scores in history_scores:
+        for col in range(COLUMN_COUNT):
+            scores[col] //= 2
+
+    moves_played = board.moves
+    best_col, best_score = None, 0
+    for depth in range(1, min(max_depth, MAX_SEARCH_DEPTH - board.moves) + 1):
+        try:
+            # Always finish the first iteration so there is a move to play
+            best_col, best_score = minimax(board, depth, -math.inf, math.inf, is_maximizing,
+                                           deadline if depth > 1 else None)
+        except SearchTimeout:
+            # Every piece the unfinished iteration played has been taken back
+            assert board.moves == moves_played, "timed-out search left pieces on the board"
+            break
+        # A forced win or loss will not change with more depth
+        if abs(best_score) == WIN_SCORE:
+            break
+    return best_col, best_score
 
 
 # Function to find all valid columns for moves
 def find_valid_columns(board):
-    valid_cols = []
-    for col in range(COLUMN_COUNT):
-        if is_column_valid(board, col):
-            valid_cols.append(col)
-    return valid_cols
+    return board.valid_columns()
 
 
 # Draw the board visually
@@ -191,15 +273,16 @@ def draw_board_image(board):
         for r in range(ROW_COUNT):
             # Black for empty spaces
             color = (0, 0, 0)
-            if board[r][c] == PLAYER_1:
+            piece = board.cell(r, c)
+            if piece == PLAYER_1:
                 color = (255, 0, 0)
-            elif board[r][c] == PLAYER_2:
+            elif piece == PLAYER_2:
                 color = (255, 255, 0)
             cv2.circle(image, (c * SQUARESIZE + SQUARESIZE // 2, r * SQUARESIZE + SQUARESIZE // 2), RADIUS, color, -1)
 
 
 # Function to show the board
-def show_game():
+def show_game(board):
     global image
     image = np.ones((SQUARESIZE * ROW_COUNT, SQUARESIZE * COLUMN_COUNT, 3), dtype=np.uint8) * 255
     draw_board_image(board)
@@ -208,30 +291,40 @@ def show_game():
 
 
 # Game variables
-board = make_board()
 SQUARESIZE = 100
 RADIUS = SQUARESIZE // 2 - 5
-turn = 0  # Start with Player 1
 
-# Main Game Loop
-while not game_over(board):
-    show_game()
 
-    # AI move (Player 2) or opponent move
-    if turn == 0:
-        col, minimax_score = minimax(board, 4, -math.inf, math.inf, True)
-    else:
-        col, minimax_score = minimax(board, 4, -math.inf, math.inf, False)
+def main():
+    board = make_board()
+    turn = 0  # Start with Player 1
+    # Precomputed opening moves, if build_opening_book.py has been run
+    opening_book = load_opening_book()
 
-    if is_column_valid(board, col):
-        row = find_next_open_spot(board, col)
-        put_piece(board, row, col, PLAYER_1 if turn == 0 else PLAYER_2)
+    # Main Game Loop
+    while not game_over(board):
+        show_game(board)
+
+        # Play straight from the book while the position is in it
+        book_entry = opening_book.probe(board) if opening_book is not None else None
+        if book_entry is not None:
+            col, minimax_score = book_entry
+        else:
+            # Player 2 maximizes the score, Player 1 minimizes it
+            col, minimax_score = iterative_deepening(board)
+
+        if is_column_valid(board, col):
+            _, status = put_piece(board, col)
+
+            if status == WINNING_MOVE:
+                show_game(board)
+                print(f"Player {1 if turn == 0 else 2} wins!")
+                break
+
+            turn = (turn + 1) % 2  # Switch turn
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
 
-        if check_winner(board, PLAYER_1 if turn == 0 else PLAYER_2):
-            show_game()
-            print(f"Player {1 if turn == 0 else 2} wins!")
-            break
 
-        turn = (turn + 1) % 2  # Switch turn
-cv2.waitKey(0)
-cv2.destroyAllWindows()
+if __name__ == "__main__":
+    main()
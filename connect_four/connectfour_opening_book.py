@@ -0,0 +1,79 @@
+# Opening book for Connect Four
+#
+# The book is a sorted file of fixed-size records, written offline by
+# build_opening_book.py:
+#
+#   header: magic b"C4BK", format version (uint16), deepest ply stored (uint16)
+#   record: canonical position key (uint64), best column (int8), value (int32)
+#
+# Keys are the mirror-canonical keys used by the transposition table, so one
+# record covers a position and its mirror image. Values are minimax scores
+# seen by Player 2. The file is memory-mapped and searched with binary search,
+# so probing costs no more resident memory than the pages it touches.
+
+import mmap
+import os
+import struct
+
+from connectfour_bitboard import COLS
+from connectfour_transposition import canonical_key
+
+MAGIC = b"C4BK"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")
+RECORD = struct.Struct("<Qbi")
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+
+class OpeningBook:
+    def __init__(self, path=DEFAULT_BOOK_PATH):
+        with open(path, "rb") as book_file:
+            self.data = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_ply = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not a version {VERSION} Connect Four opening book")
+        self.size = (len(self.data) - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        self.data.close()
+
+    # Look up a position, returns (best column, value) or None
+    def probe(self, board):
+        if board.moves > self.max_ply:
+            return None
+        key, flipped = canonical_key(board)
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            record_key, col, value = RECORD.unpack_from(self.data, HEADER.size + middle * RECORD.size)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                return (COLS - 1 - col if flipped else col), value
+        return None
+
+
+# Open the book if it has been built, otherwise return None
+# An empty, truncated or foreign file is treated like a missing one
+def load_opening_book(path=DEFAULT_BOOK_PATH):
+    if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+        return None
+    with open(path, "rb") as book_file:
+        magic, version, _ = HEADER.unpack(book_file.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        return None
+    return OpeningBook(path)
+
+
+# Write (canonical key, best column, value) records as a book file
+def write_opening_book(path, records, max_ply):
+    with open(path, "wb") as book_file:
+        book_file.write(HEADER.pack(MAGIC, VERSION, max_ply))
+        for key, col, value in sorted(records):
+            book_file.write(RECORD.pack(key, col, value))
@@ -0,0 +1,65 @@
+# Batched random playouts for Connect Four
+#
+# N copies of a position are played out to the end at the same time. Every
+# game is stored as two uint64 bitboards plus a row of column heights, using
+# the same bit layout as connectfour_bitboard, so one ply of all N games is a
+# handful of NumPy operations instead of N trips through Python.
+
+import numpy as np
+
+from connectfour_bitboard import COLS, ROWS, DIRECTIONS, TOP_BITS, PLAYER_1, PLAYER_2, EMPTY
+
+ONE = np.uint64(1)
+TOP = np.array(TOP_BITS, dtype=np.int64)
+SHIFTS = [(np.uint64(shift), np.uint64(2 * shift)) for shift in DIRECTIONS]
+
+default_rng = np.random.default_rng()
+
+
+# Vectorized shift-and-AND four in a row check over an array of masks
+def connected_four(masks):
+    won = np.zeros(masks.shape, dtype=bool)
+    for shift, double_shift in SHIFTS:
+        pairs = masks & (masks >> shift)
+        won |= (pairs & (pairs >> double_shift)) != 0
+    return won
+
+
+# Play n random games from a position, returns the winner of each game
+# (PLAYER_1, PLAYER_2 or EMPTY for a draw) as an int8 array
+def batch_random_playouts(board, n, rng=None):
+    if rng is None:
+        rng = default_rng
+    winners = np.full(n, EMPTY, dtype=np.int8)
+
+    # A finished position has the same result in every game
+    if board.has_won(PLAYER_1):
+        winners[:] = PLAYER_1
+        return winners
+    if board.has_won(PLAYER_2):
+        winners[:] = PLAYER_2
+        return winners
+
+    masks = np.array([board.masks] * n, dtype=np.uint64)
+    heights = np.array([board.heights] * n, dtype=np.int64)
+    games = np.arange(n)  # Games that are still running
+
+    for moves in range(board.moves, ROWS * COLS):
+        side = moves & 1
+        # Random legal column for every running game
+        keys = rng.random((len(games), COLS))
+        keys[heights[games] == TOP] = -1.0
+        cols = keys.argmax(axis=1)
+
+        bits = heights[games, cols]
+        heights[games, cols] = bits + 1
+        side_masks = masks[games, side] | (ONE << bits.astype(np.uint64))
+        masks[games, side] = side_masks
+
+        won = connected_four(side_masks)
+        winners[games[won]] = PLAYER_2 if side else PLAYER_1
+        games = games[~won]
+        if len(games) == 0:
+            break
+
+    return winners
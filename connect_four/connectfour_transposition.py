@@ -0,0 +1,57 @@
+# Transposition table for the Connect Four minimax search
+#
+# Positions are keyed by the bitboard key. A position and its left-right
+# mirror image always have the same score, so entries are stored under the
+# smaller of the two keys and the best column is flipped on the way in and out.
+
+from connectfour_bitboard import COLS, mirror
+
+# Kinds of score kept in an entry, scores are seen by Player 2
+EXACT = 0  # Every column was searched inside the window
+LOWER_BOUND = 1  # Score reached beta, Player 2 can get at least this
+UPPER_BOUND = 2  # Score stayed at or below alpha, Player 2 gets at most this
+
+
+class TranspositionTable:
+    def __init__(self, size=1 << 20):
+        # One entry per slot, a canonical key goes to slot key % size
+        self.size = size
+        self.slots = [None] * size
+        # Number of iterative_deepening calls so far, stored with every entry
+        self.generation = 0
+
+    # Start searching the next move, older entries stay readable but lose their slot to any store
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.slots = [None] * self.size
+
+    # Look up a canonical key, the best column comes back in the board's own orientation
+    def probe(self, key, flipped):
+        entry = self.slots[key % self.size]
+        if entry is None or entry[0] != key:
+            return None
+        _, depth, bound, col, value, _ = entry
+        if flipped:
+            col = COLS - 1 - col
+        return depth, bound, col, value
+
+    # Store under the canonical key, mirroring the column if the board was mirrored
+    # A different position already in the slot survives only if it is deeper and from this move
+    def store(self, key, flipped, depth, bound, col, value):
+        if flipped:
+            col = COLS - 1 - col
+        index = key % self.size
+        entry = self.slots[index]
+        if entry is None or entry[0] == key or entry[5] != self.generation or depth >= entry[1]:
+            self.slots[index] = (key, depth, bound, col, value, self.generation)
+
+
+# Key shared by a position and its mirror image, and whether it was mirrored
+def canonical_key(board):
+    key = board.key()
+    mirrored_key = mirror(key)
+    if mirrored_key < key:
+        return mirrored_key, True
+    return key, False
@@ -0,0 +1,240 @@
+# Go board with incrementally tracked chains
+#
+# Points are numbered row * size + col. Every stone belongs to a chain that
+# keeps its stones and the set of its liberties. Placing a stone merges it
+# with the friendly chains next to it and takes a liberty from the enemy
+# chains, removing the ones left without any. A legality check only looks at
+# the four neighbours and a move costs time in the size of the chains it
+# touches, so nothing ever scans the whole board.
+#
+# The board also keeps a Zobrist hash of its stones, updated with every stone
+# placed or captured, and the set of hashes of all positions so far. A move
+# that would bring back an earlier position is illegal (positional superko).
+# On request it also keeps the hash of the board under each of the 8
+# rotations and reflections, for tables that treat symmetric positions as one.
+
+import random
+
+import numpy as np
+
+EMPTY = 0
+BLACK = 1
+WHITE = -1
+
+_neighbor_tables = {}
+_zobrist_tables = {}
+_symmetry_tables = {}
+
+
+def neighbor_table(size):
+    """ Points next to every point, built once per board size. """
+    if size not in _neighbor_tables:
+        table = []
+        for row in range(size):
+            for col in range(size):
+                table.append(tuple(nr * size + nc for nr, nc in ((row - 1, col), (row + 1, col),
+                                                                 (row, col - 1), (row, col + 1))
+                                   if 0 <= nr < size and 0 <= nc < size))
+        _neighbor_tables[size] = table
+    return _neighbor_tables[size]
+
+
+def zobrist_table(size):
+    """ Zobrist keys of a black and a white stone on every point, built once per board size. """
+    if size not in _zobrist_tables:
+        rng = random.Random(20240601 + size)
+        _zobrist_tables[size] = {color: [rng.getrandbits(64) for _ in range(size * size)] for color in (BLACK, WHITE)}
+    return _zobrist_tables[size]
+
+
+def symmetry_table(size):
+    """
+    Point every point goes to under the 8 rotations and reflections of the
+    board, and the inverse of each. Symmetry 0 is the identity.
+    """
+    if size not in _symmetry_tables:
+        transforms = []
+        for symmetry in range(8):
+            table = []
+            for point in range(size * size):
+                row, col = divmod(point, size)
+                if symmetry & 4:
+                    row, col = col, row
+                if symmetry & 1:
+                    row = size - 1 - row
+                if symmetry & 2:
+                    col = size - 1 - col
+                table.append(row * size + col)
+            transforms.append(table)
+        inverses = []
+        for table in transforms:
+            inverse = [0] * (size * size)
+            for point, image in enumerate(table):
+                inverse[image] = point
+            inverses.append(inverse)
+        zobrist = zobrist_table(size)
+        # Key of a stone under every symmetry: the key of the point it is mapped to
+        keys = [{color: [zobrist[color][table[p]] for p in range(size * size)] for color in (BLACK, WHITE)}
+                for table in transforms]
+        _symmetry_tables[size] = transforms, inverses, keys
+    return _symmetry_tables[size]
+
+
+class Chain:
+    __slots__ = ("color", "stones", "liberties", "key")
+
+    def __init__(self, color, stones, liberties, key):
+        self.color = color
+        self.stones = stones
+        self.liberties = liberties
+        # Zobrist keys of all the stones xored together
+        self.key = key
+
+
+class GoBoard:
+    def __init__(self, size=5, symmetries=False):
+        self.size = size
+        self.neighbors = neighbor_table(size)
+        self.zobrist = zobrist_table(size)
+        # Stone on every point, EMPTY, BLACK or WHITE
+        self.stones = [EMPTY] * (size * size)
+        # Chain of the stone on every point, None on empty points
+        self.chains = [None] * (size * size)
+        self.stone_count = {BLACK: 0, WHITE: 0}
+        # Zobrist hash of the stones, and the hashes of every position of the game
+        self.hash = 0
+        self.history = {0}
+        # Hash of the board under every symmetry, only kept when asked for
+        self.symmetry_keys = symmetry_table(size)[2] if symmetries else None
+        self.symmetry_hashes = [0] * 8 if symmetries else None
+
+    def copy(self):
+        new = GoBoard.__new__(GoBoard)
+        new.size = self.size
+        new.neighbors = self.neighbors
+        new.zobrist = self.zobrist
+        new.stones = self.stones[:]
+        copies = {}
+        new.chains = []
+        for chain in self.chains:
+            if chain is not None:
+                copied = copies.get(id(chain))
+                if copied is None:
+                    copied = copies[id(chain)] = Chain(chain.color, chain.stones[:], set(chain.liberties), chain.key)
+                chain = copied
+            new.chains.append(chain)
+        new.stone_count = dict(self.stone_count)
+        new.hash = self.hash
+        new.history = set(self.history)
+        new.symmetry_keys = self.symmetry_keys
+        new.symmetry_hashes = self.symmetry_hashes[:] if self.symmetry_hashes is not None else None
+        return new
+
+    def point(self, row, col):
+        return row * self.size + col
+
+    def coords(self, point):
+        return divmod(point, self.size)
+
+    def is_legal(self, point, color):
+        """
+        A stone may go on an empty point unless it would be left without liberties:
+        it needs an empty neighbour, a friendly chain that keeps another liberty,
+        or an enemy chain whose last liberty it takes. The position after the
+        move, captures included, must not have been seen before.
+        """
+        if self.stones[point] != EMPTY:
+            return False
+        has_liberty = False
+        key = self.hash ^ self.zobrist[color][point]
+        captured = []
+        for neighbor in self.neighbors[point]:
+            stone = self.stones[neighbor]
+            if stone == EMPTY:
+                has_liberty = True
+                continue
+            chain = self.chains[neighbor]
+            if stone == color:
+                if len(chain.liberties) > 1:
+                    has_liberty = True
+            elif len(chain.liberties) == 1 and chain not in captured:
+                captured.append(chain)
+                key ^= chain.key
+        if not has_liberty and not captured:
+            return False
+        return key not in self.history
+
+    def legal_moves(self, color):
+        return [p for p in range(self.size * self.size) if self.stones[p] == EMPTY and self.is_legal(p, color)]
+
+    def play(self, point, color):
+        """ Place a legal stone and remove the enemy chains it captures. Returns the captured points. """
+        stone_key = self.zobrist[color][point]
+        chain = Chain(color, [point], set(), stone_key)
+        self.hash ^= stone_key
+        if self.symmetry_hashes is not None:
+            self.update_symmetry_hashes([point], color)
+        self.stones[point] = color
+        self.chains[point] = chain
+        self.stone_count[color] += 1
+        captured = []
+        for neighbor in self.neighbors[point]:
+            stone = self.stones[neighbor]
+            if stone == EMPTY:
+                chain.liberties.add(neighbor)
+                continue
+            other = self.chains[neighbor]
+            if other is chain:
+                continue
+            other.liberties.discard(point)
+            if stone == color:
+                chain = self.merge(chain, other)
+            elif not other.liberties:
+                captured += self.remove_chain(other)
+        self.history.add(self.hash)
+        return captured
+
+    def merge(self, chain, other):
+        """ Join two chains of one colour, the smaller one is relabelled. """
+        if len(chain.stones) < len(other.stones):
+            chain, other = other, chain
+        chains = self.chains
+        for stone in other.stones:
+            chains[stone] = chain
+        chain.stones += other.stones
+        chain.liberties |= other.liberties
+        chain.key ^= other.key
+        return chain
+
+    def remove_chain(self, chain):
+        """ Take a captured chain off the board, its points become liberties of the chains around it. """
+        for stone in chain.stones:
+            self.stones[stone] = EMPTY
+            self.chains[stone] = None
+        self.stone_count[chain.color] -= len(chain.stones)
+        self.hash ^= chain.key
+        if self.symmetry_hashes is not None:
+            self.update_symmetry_hashes(chain.stones, chain.color)
+        for stone in chain.stones:
+            for neighbor in self.neighbors[stone]:
+                other = self.chains[neighbor]
+                if other is not None:
+                    other.liberties.add(stone)
+        return chain.stones
+
+    def update_symmetry_hashes(self, points, color):
+        """ Add or remove stones of one colour in the hashes of all symmetries. """
+        hashes = self.symmetry_hashes
+        for symmetry, keys in enumerate(self.symmetry_keys):
+            color_keys = keys[color]
+            for point in points:
+                hashes[symmetry] ^= color_keys[point]
+
+    def liberties(self, point):
+        """ Number of liberties of the chain on a point. """
+        chain = self.chains[point]
+        return len(chain.liberties) if chain is not None else 0
+
+    def grid(self):
+        """ size x size array of the stones, used for drawing and scoring. """
+        return np.array(self.stones, dtype=int).reshape(self.size, self.size)
@@ -3,61 +3,108 @@ import cv2
 import random
 import math
 
+from go_board import GoBoard
+from go_playout import PlayoutBoard
+from go_scoring import territory
+
+# Simulations after which a child's own statistics weigh as much as its AMAF statistics
+RAVE_EQUIVALENCE = 200
+
 # Node class for the Monte Carlo Tree Search (MCTS)
 class GameNode:
-    def __init__(self, game_grid, parent=None, move_made=None, current_player=1):
+    def __init__(self, board, parent=None, move_made=None, current_player=1):
         """
         Represents a node in the game tree.
+        The node owns the GoBoard of its position, current_player is the player to move.
+        A position reached by different move orders has one node, so a node can
+        have several parents. parent and move_made are those of the first one.
         """
-        self.grid = np.copy(game_grid)
+        self.board = board
         self.parent = parent
         self.move_made = move_made
         self.player = current_player
         self.visits = 0
         self.score = 0
-        self.kids = []
+        # Child node of every tried move
+        self.kids = {}
+        # All-moves-as-first statistics of the moves of the player to move,
+        # move -> [simulations where the player played it first, score]
+        self.amaf = {}
+        # Legal moves of this position, found once and expanded one at a time
+        self.untried_moves = [board.coords(p) for p in board.legal_moves(current_player)]
+
+    @property
+    def grid(self):
+        return self.board.grid()
+
+    def expand_node(self, nodes):
+        """
+        Add a child for the untried move with the best AMAF value and return the move and the child.
+        nodes maps (board hash, player to move) to the nodes of the search, the
+        child is taken from it when the position has been reached before.
+        """
+        move = max(self.untried_moves, key=lambda m: (self.amaf_value(m), random.random()))
+        self.untried_moves.remove(move)
+        # Copy the board state and play the move, with captures
+        new_board = self.board.copy()
+        new_board.play(new_board.point(*move), self.player)
+        key = (new_board.hash, -self.player)
+        child = nodes.get(key)
+        if child is None:
+            child = nodes[key] = GameNode(new_board, self, move, -self.player)
+        self.kids[move] = child
+        return move, child
 
-    def expand_node(self, all_moves):
+    def amaf_value(self, move):
         """
-        Add new child nodes for all possible moves.
+        Average AMAF score of a move, 0 before it has been seen in a simulation.
         """
-        # Go through each move
-        for m in all_moves:
-            # Copy the board state
-            new_board = np.copy(self.grid)
-            row, col = m
-            new_board[row, col] = self.player
-            # Add new node
-            self.kids.append(GameNode(new_board, self, m, -self.player))
+        visits, score = self.amaf.get(move, (0, 0))
+        return score / visits if visits else 0
 
     def find_best_child(self, explore_factor=1.4):
         """
-        Find the child node with the highest UCT score.
+        Find the move and child node with the highest UCT score.
+        The value of a child blends its own average with its AMAF average, the
+        AMAF weight fades as the child gets visits of its own.
         """
         # If no moves exist, return None
         if not self.kids:
             return None
-        # Formula to balance exploration and exploitation
-        return max(self.kids, key=lambda child: child.score / (child.visits + 1e-6) +
-                   explore_factor * math.sqrt(math.log(self.visits + 1) / (child.visits + 1e-6)))
 
-    def backtrack_results(self, result):
+        def uct(item):
+            move, child = item
+            weight = math.sqrt(RAVE_EQUIVALENCE / (3 * child.visits + RAVE_EQUIVALENCE))
+            value = (1 - weight) * child.score / (child.visits + 1e-6) + weight * self.amaf_value(move)
+            # Formula to balance exploration and exploitation
+            return value + explore_factor * math.sqrt(math.log(self.visits + 1) / (child.visits + 1e-6))
+
+        return max(self.kids.items(), key=uct)
+
+    def backtrack_results(self, result, played=None):
         """
-        Backpropagate results of the simulation to the root node.
+        Add the result of a simulation that went through this node.
+        result is 1 for a Black win and -1 for a White win, every node scores it
+        for the player who made the move leading to it.
+        played maps every move made after this node to the player who made it first.
         """
         # Increment visit count
         self.visits += 1
-        # Update score
-        self.score += result
-        # Backtrack to parent with flipped result
-        if self.parent:
-            self.parent.backtrack_results(-result)
+        # Update score, the move into this node was made by -self.player
+        self.score -= self.player * result
+        if played is not None:
+            # Every move the player to move made later counts as if made here
+            for move, player in played.items():
+                if player == self.player:
+                    stats = self.amaf.setdefault(move, [0, 0])
+                    stats[0] += 1
+                    stats[1] += self.player * result
 
-    def fully_expanded(self, all_moves):
+    def fully_expanded(self):
         """
         Check if all possible moves have been expanded as children.
         """
-        return len(self.kids) == len(all_moves)
+        return not self.untried_moves
 
 # Main Go Game class
 class SimpleGoGame:
@@ -66,7 +113,10 @@ class SimpleGoGame:
         Set up the game board and basic parameters.
         """
         self.size = board_size
-        self.grid = np.zeros((board_size, board_size), dtype=int)
+        # Stones and chains, captures are handled by the board
+        self.board = GoBoard(board_size)
+        # Light engine the random playouts run on
+        self.playout_board = PlayoutBoard(board_size)
         self.turn = 1
         self.tile_size = 100
         self.bg_color = (255, 220, 180)
@@ -75,45 +125,28 @@ class SimpleGoGame:
         self.pass_counter = 0
         self.done = False
 
-    def check_valid_spot(self, row, col):
+    @property
+    def grid(self):
         """
-        Verify if a move is valid.
+        Board as a size x size array.
         """
-        # Outside the board or already occupied
-        if not (0 <= row < self.size and 0 <= col < self.size) or self.grid[row, col] != 0:
-            return False
-
-        # Check if placing a stone creates liberties
-        temp_grid = np.copy(self.grid)
-        temp_grid[row, col] = self.turn
-        return self.check_liberty(temp_grid, row, col)
+        return self.board.grid()
 
-    def check_liberty(self, grid_state, row, col, visited=None):
+    def check_valid_spot(self, row, col):
         """
-        Check for liberties (free spaces) for a group of stones.
+        Verify if a move is valid.
         """
-        if visited is None:
-            visited = set()
-        if (row, col) in visited:
+        # Outside the board
+        if not (0 <= row < self.size and 0 <= col < self.size):
             return False
-        visited.add((row, col))
-
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            # Check neighboring cells
-            nr, nc = row + dx, col + dy
-            if 0 <= nr < self.size and 0 <= nc < self.size:
-                # Liberty found
-                if grid_state[nr, nc] == 0:
-                    return True
-                if grid_state[nr, nc] == grid_state[row, col] and self.check_liberty(grid_state, nr, nc, visited):
-                    return True
-        return False
+        # Empty, and the stone keeps a liberty or captures
+        return self.board.is_legal(self.board.point(row, col), self.turn)
 
     def possible_moves(self):
         """
         Return all valid moves for the current player.
         """
-        return [(row, col) for row in range(self.size) for col in range(self.size) if self.check_valid_spot(row, col)]
+        return [self.board.coords(p) for p in self.board.legal_moves(self.turn)]
 
     def place_stone(self, row, col):
         """
@@ -121,7 +154,8 @@ class SimpleGoGame:
         """
         if not self.check_valid_spot(row, col):
             return False
-        self.grid[row, col] = self.turn
+        # Captured stones are taken off by the board
+        self.board.play(self.board.point(row, col), self.turn)
         # Switch player turn
         self.turn *= -1
         self.pass_counter = 0
@@ -142,8 +176,10 @@ class SimpleGoGame:
         """
         Calculate final scores and determine the winner.
         """
-        black_score = np.sum(self.grid == 1)
-        white_score = np.sum(self.grid == -1)
+        # Area scoring: stones plus the empty regions only one colour borders
+        owners = territory(self.grid)
+        black_score = int(np.sum(owners == 1))
+        white_score = int(np.sum(owners == -1))
         print("Game Over!")
         print(f"Final Score -> Black: {black_score}, White: {white_score}")
         if black_score > white_score:
@@ -158,36 +194,49 @@ class SimpleGoGame:
         """
         Perform Monte Carlo Tree Search to find the best move.
         """
-        root = GameNode(self.grid, current_player=self.turn)
+        root = GameNode(self.board.copy(), current_player=self.turn)
+        # Every node of the search by (board hash, player to move)
+        nodes = {(root.board.hash, root.player): root}
         for _ in range(simulations):
             node = root
-            while node.kids and node.fully_expanded(self.possible_moves()):
-                node = node.find_best_child()
-            valid_moves = self.possible_moves()
-            if not node.kids and valid_moves:
-                node.expand_node(valid_moves)
-                node = random.choice(node.kids)
-            result = self.simulate_random_game(node.grid, node.player)
-            node.backtrack_results(result)
-        best_next = root.find_best_child(explore_factor=0)
-        return best_next.move_made if best_next else None
-
-    def simulate_random_game(self, grid, player):
-        """
-        Simulate a game randomly.
-        """
-        sim_grid = np.copy(grid)
-        temp_player = player
-        while True:
-            all_moves = [(r, c) for r in range(self.size) for c in range(self.size) if sim_grid[r, c] == 0]
-            if not all_moves:
-                break
-            r, c = random.choice(all_moves)
-            sim_grid[r, c] = temp_player
-            temp_player *= -1
-        black = np.sum(sim_grid == 1)
-        white = np.sum(sim_grid == -1)
-        return 1 if black > white else -1 if white > black else 0
+            # Nodes visited by this simulation with the move into each
+            path = [(root, None)]
+            seen = {root}
+            # Follow the best children while every move of the node has been tried
+            while node.kids and node.fully_expanded():
+                move, node = node.find_best_child()
+                if node in seen:
+                    break
+                path.append((node, move))
+                seen.add(node)
+            # Add one untried move of the node's own position
+            if node.untried_moves:
+                move, node = node.expand_node(nodes)
+                path.append((node, move))
+            moves = []
+            result = self.simulate_random_game(node.board, node.player, moves)
+            # First player of every point in the playout, for the AMAF statistics
+            played = {}
+            for point, player in moves:
+                played.setdefault(node.board.coords(point), player)
+            # Backpropagate along the path the simulation took
+            for path_node, move in reversed(path):
+                path_node.backtrack_results(result, played)
+                # The move into this node came before everything after it
+                if move is not None:
+                    played[move] = -path_node.player
+        # The most simulated move is the most reliable choice
+        if not root.kids:
+            return None
+        return max(root.kids.items(), key=lambda item: item[1].visits)[0]
+
+    def simulate_random_game(self, board, player, record=None):
+        """
+        Simulate a game randomly from a GoBoard, with captures, until both players pass.
+        The moves are appended to record as (point, player) if it is given.
+        """
+        self.playout_board.load(board)
+        return self.playout_board.playout(player, record=record)
 
     def show_board(self):
         """
@@ -196,6 +245,7 @@ class SimpleGoGame:
         img_size = self.size * self.tile_size
         img = np.ones((img_size, img_size, 3), dtype=np.uint8) * 255
         img[:, :] = self.bg_color
+        grid = self.grid
         for i in range(self.size + 1):
             start = i * self.tile_size
             cv2.line(img, (start, 0), (start, img_size), (0, 0, 0), 2)
@@ -203,9 +253,9 @@ class SimpleGoGame:
         for r in range(self.size):
             for c in range(self.size):
                 center = (c * self.tile_size + self.tile_size // 2, r * self.tile_size + self.tile_size // 2)
-                if self.grid[r, c] == 1:
+                if grid[r, c] == 1:
                     cv2.circle(img, center, self.tile_size // 3, self.black_stone, -1)
-                elif self.grid[r, c] == -1:
+                elif grid[r, c] == -1:
                     cv2.circle(img, center, self.tile_size // 3, self.white_stone, -1)
         return img
 
@@ -1,13 +1,21 @@
 import numpy as np
 import cv2
 import math
+import copy
+
+from go_board import GoBoard
+from go_scoring import territory, estimate_scores
+from go_transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, canonical_key, to_canonical, from_canonical
 
 
 class SimpleGoGame:
     def __init__(self, board_size=5):
         # Initialize board and some settings
         self.board_size = board_size
-        self.grid = np.zeros((board_size, board_size), dtype=int)
+        # Stones and chains, captures are handled by the board
+        self.board = GoBoard(board_size, symmetries=True)
+        # Search results shared by all the copies made during a search
+        self.table = TranspositionTable()
         self.player_turn = 1
         self.tile_size = 100
         self.background_color = (255, 220, 180)
@@ -16,64 +24,27 @@ class SimpleGoGame:
         self.pass_moves = 0
         self.game_finished = False
 
-    def check_valid_move(self, row, col):
+    @property
+    def grid(self):
         """
-        Check if the move is valid by placing a stone temporarily.
+        Board as a size x size array, used for drawing.
         """
-        # Out of bounds or not empty
-        if not (0 <= row < self.board_size and 0 <= col < self.board_size) or self.grid[row, col] != 0:
-            return False
+        return self.board.grid()
 
-        # Place the stone temporarily and check if it has liberties
-        self.grid[row, col] = self.player_turn
-        is_valid = self.check_liberty(row, col)
-        # reverse the move
-        self.grid[row, col] = 0
-        return is_valid
-
-    def check_liberty(self, row, col, visited=None):
+    def check_valid_move(self, row, col):
         """
-        Check if a stone (or group) has any liberties (empty spaces around it).
+        Check if the move is valid: an empty point where the stone keeps a liberty or captures.
         """
-        if visited is None:
-            visited = set()
-        if (row, col) in visited:
+        # Out of bounds
+        if not (0 <= row < self.board_size and 0 <= col < self.board_size):
             return False
-        visited.add((row, col))
-
-        # Found an empty space
-        if self.grid[row, col] == 0:
-            return True
-
-        for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nr, nc = row + dr, col + dc
-            if 0 <= nr < self.board_size and 0 <= nc < self.board_size:
-                if self.grid[nr, nc] == 0 or (
-                        self.grid[nr, nc] == self.grid[row, col] and self.check_liberty(nr, nc, visited)):
-                    return True
-        return False
-
-    def clear_captured_stones(self):
-        """
-        Remove stones that are captured (no liberties).
-        """
-        # List of stones to remove
-        captured = []
-        for r in range(self.board_size):
-            for c in range(self.board_size):
-                if self.grid[r, c] != 0 and not self.check_liberty(r, c):
-                    # Mark stone to remove
-                    captured.append((r, c))
-        for r, c in captured:
-            # Remove the captured stones
-            self.grid[r, c] = 0
+        return self.board.is_legal(self.board.point(row, col), self.player_turn)
 
     def apply_move(self, row, col):
         """
-        Place a stone on the board and check for captures.
+        Place a stone on the board, the board removes captured stones.
         """
-        self.grid[row, col] = self.player_turn
-        self.clear_captured_stones()
+        self.board.play(self.board.point(row, col), self.player_turn)
         # Switch players
         self.player_turn *= -1
 
@@ -81,22 +52,19 @@ class SimpleGoGame:
         """
         Get a list of all possible moves for the player.
         """
-        possible_moves = []
-        for r in range(self.board_size):
-            for c in range(self.board_size):
-                if self.check_valid_move(r, c):
-                    possible_moves.append((r, c))
-        return possible_moves
+        return [self.board.coords(p) for p in self.board.legal_moves(self.player_turn)]
 
     def calculate_score(self):
         """
-        Simple evaluation: count black stones and white stones.
+        Estimated Black score minus White score: stones plus the points each side is likely to own.
         """
-        return np.sum(self.grid)
+        return float(estimate_scores(self.grid))
 
     def minimax(self, depth, alpha, beta, is_max):
         """
         Minimax algorithm with pruning to make a decision.
+        Results are shared through the transposition table between a position
+        and its rotations and reflections.
         """
         if depth == 0 or self.check_game_end():
             # Score the board
@@ -107,6 +75,33 @@ class SimpleGoGame:
         if not valid_moves:
             return self.calculate_score(), None
 
+        # Reuse a stored result for this position or a symmetric one
+        key, symmetry = canonical_key(self.board, self.player_turn)
+        alpha_start, beta_start = alpha, beta
+        entry = self.table.probe(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, bound, stored_move, tt_value = entry
+            # The stored move is a point of the canonical board
+            tt_move = from_canonical(self.board, stored_move, symmetry)
+            # The key leaves out the superko history, so the entry may come from a
+            # game where its move was legal here but is not now. Search it afresh
+            if tt_move in valid_moves:
+                if entry_depth >= depth:
+                    if bound == EXACT:
+                        return tt_value, tt_move
+                    elif bound == LOWER_BOUND:
+                        alpha = max(alpha, tt_value)
+                    elif bound == UPPER_BOUND:
+                        beta = min(beta, tt_value)
+                    if beta <= alpha:
+                        return tt_value, tt_move
+                # Try the stored best move first
+                valid_moves.remove(tt_move)
+                valid_moves.insert(0, tt_move)
+            else:
+                tt_move = None
+
         # Maximizing player (black)
         if is_max:
             max_value = -math.inf
@@ -121,7 +116,7 @@ class SimpleGoGame:
                 alpha = max(alpha, score)
                 if beta <= alpha:
                     break  # Prune
-            return max_value, best_step
+            best_value = max_value
         # Minimizing player (white)
         else:
             min_value = math.inf
@@ -137,7 +132,17 @@ class SimpleGoGame:
                 # Prune
                 if beta <= alpha:
                     break
-            return min_value, best_step
+            best_value = min_value
+
+        # Scores outside the window this call started with are bounds
+        if best_value <= alpha_start:
+            bound = UPPER_BOUND
+        elif best_value >= beta_start:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.table.store(key, depth, bound, to_canonical(self.board, best_step, symmetry), best_value)
+        return best_value, best_step
 
     def check_game_end(self):
         """
@@ -149,9 +154,8 @@ class SimpleGoGame:
         """
         Create a copy of the game state for simulations.
         """
-        copied_game = SimpleGoGame(self.board_size)
-        copied_game.grid = np.copy(self.grid)
-        copied_game.player_turn = self.player_turn
+        copied_game = copy.copy(self)
+        copied_game.board = self.board.copy()
         return copied_game
 
     def display_board(self):
@@ -161,6 +165,7 @@ class SimpleGoGame:
         board_img_size = self.board_size * self.tile_size
         board_img = np.ones((board_img_size, board_img_size, 3), dtype=np.uint8) * 255
         board_img[:, :] = self.background_color
+        grid = self.grid
 
         for i in range(self.board_size + 1):
             pos = i * self.tile_size
@@ -170,20 +175,31 @@ class SimpleGoGame:
         for r in range(self.board_size):
             for c in range(self.board_size):
                 center = (c * self.tile_size + self.tile_size // 2, r * self.tile_size + self.tile_size // 2)
-                if self.grid[r, c] == 1:
+                if grid[r, c] == 1:
                     cv2.circle(board_img, center, self.tile_size // 3, self.black_color, -1)
-                elif self.grid[r, c] == -1:
+                elif grid[r, c] == -1:
                     cv2.circle(board_img, center, self.tile_size // 3, self.white_color, -1)
         return board_img
 
-    def start_game(self, search_depth=3):
+    def select_move(self, search_depth):
+        """
+        Search one ply deeper at a time up to search_depth.
+        Every iteration tries the previous iteration's best moves first.
+        """
+        self.table.new_search()
+        chosen_move = None
+        for depth in range(1, search_depth + 1):
+            _, chosen_move = self.minimax(depth, -math.inf, math.inf, self.player_turn == 1)
+        return chosen_move
+
+    def start_game(self, search_depth=5):
         """Run the Go game using minimax."""
         while not self.check_game_end():
             img = self.display_board()
             cv2.imshow("Simple Go Game", img)
             cv2.waitKey(500)
 
-            _, chosen_move = self.minimax(search_depth, -math.inf, math.inf, self.player_turn == 1)
+            chosen_move = self.select_move(search_depth)
             if chosen_move:
                 self.apply_move(*chosen_move)
                 print(f"Player {'Black' if self.player_turn == -1 else 'White'} moves to {chosen_move}")
@@ -193,7 +209,9 @@ class SimpleGoGame:
                 self.player_turn *= -1
 
         print("Game Over!")
-        black, white = np.sum(self.grid == 1), np.sum(self.grid == -1)
+        # Area scoring: stones plus the empty regions only one colour borders
+        owners = territory(self.grid)
+        black, white = int(np.sum(owners == 1)), int(np.sum(owners == -1))
         print(f"Final Score: Black = {black}, White = {white}")
         print("Winner:", "Black" if black > white else "White" if white > black else "Tie")
 
@@ -204,4 +222,4 @@ class SimpleGoGame:
 # Start the game
 if __name__ == "__main__":
     game = SimpleGoGame(board_size=5)
-    game.start_game(search_depth=3)
+    game.start_game(search_depth=5)
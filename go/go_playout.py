@@ -0,0 +1,246 @@
+# Light random playouts for Go
+#
+# The board is a flat list with a border of sentinel points around it, so a
+# point's four neighbours are always point - 1, point + 1, point - width and
+# point + width and nothing needs a bounds check. The tables of neighbours and
+# diagonals are built once per board size.
+#
+# Chains are circular lists of stones (next_stone) with one representative
+# point (chain) holding the number of pseudo-liberties: empty points counted
+# once for every stone of the chain next to them. A chain is captured exactly
+# when that count drops to zero. Empty points are kept in a list with an index
+# per point, so a random empty point is picked and removed in O(1).
+#
+# Moves that fill a player's own eye are never played, which makes every
+# playout end once both players only have eyes left.
+
+import random
+
+from go_board import EMPTY, BLACK, WHITE
+
+BORDER = 2
+
+_tables = {}
+
+
+def playout_tables(size):
+    """ Neighbour and diagonal points of every point of the padded board. """
+    if size not in _tables:
+        width = size + 2
+        points = [(r + 1) * width + c + 1 for r in range(size) for c in range(size)]
+        neighbors = [()] * (width * width)
+        diagonals = [()] * (width * width)
+        for p in points:
+            neighbors[p] = (p - width, p - 1, p + 1, p + width)
+            diagonals[p] = (p - width - 1, p - width + 1, p + width - 1, p + width + 1)
+        _tables[size] = width, points, neighbors, diagonals
+    return _tables[size]
+
+
+class PlayoutBoard:
+    def __init__(self, size=9):
+        self.size = size
+        self.width, self.points, self.neighbors, self.diagonals = playout_tables(size)
+        self.clear()
+
+    def clear(self):
+        area = self.width * self.width
+        self.stones = [BORDER] * area
+        self.chain = [0] * area
+        self.next_stone = [0] * area
+        self.liberties = [0] * area
+        self.chain_size = [0] * area
+        self.empties = []
+        self.empty_index = [-1] * area
+        for p in self.points:
+            self.stones[p] = EMPTY
+            self.add_empty(p)
+        # Point the player to move may not take back straight away, or 0
+        self.ko = 0
+
+    def padded(self, point):
+        """ Padded index of a GoBoard point. """
+        row, col = divmod(point, self.size)
+        return (row + 1) * self.width + col + 1
+
+    def unpadded(self, p):
+        row, col = divmod(p, self.width)
+        return (row - 1) * self.size + col - 1
+
+    def load(self, board):
+        """ Copy the stones of a GoBoard. """
+        self.clear()
+        for point, stone in enumerate(board.stones):
+            if stone != EMPTY:
+                self.place(self.padded(point), stone)
+
+    def add_empty(self, p):
+        self.empty_index[p] = len(self.empties)
+        self.empties.append(p)
+
+    def remove_empty(self, p):
+        """ Swap the point with the last empty point and drop it. """
+        index = self.empty_index[p]
+        last = self.empties.pop()
+        if last != p:
+            self.empties[index] = last
+            self.empty_index[last] = index
+        self.empty_index[p] = -1
+
+    def is_eye(self, p, color):
+        """
+        A point surrounded by one player's stones where the opponent holds at
+        most one diagonal, or none on the edge of the board.
+        """
+        stones = self.stones
+        for n in self.neighbors[p]:
+            if stones[n] != color and stones[n] != BORDER:
+                return False
+        enemy, edge = 0, 0
+        for d in self.diagonals[p]:
+            if stones[d] == BORDER:
+                edge = 1
+            elif stones[d] == -color:
+                enemy += 1
+        return enemy + edge < 2
+
+    def is_legal(self, p, color):
+        """ Not the ko point, and the stone keeps a liberty or captures. """
+        if p == self.ko:
+            return False
+        stones, chain, liberties = self.stones, self.chain, self.liberties
+        neighbors = self.neighbors[p]
+        for n in neighbors:
+            if stones[n] == EMPTY:
+                return True
+        for n in neighbors:
+            stone = stones[n]
+            if stone == BORDER:
+                continue
+            # Pseudo-liberties the chain loses to this stone
+            root = chain[n]
+            touching = sum(1 for m in neighbors if stones[m] == stone and chain[m] == root)
+            if stone == color:
+                if liberties[root] > touching:
+                    return True
+            elif liberties[root] == touching:
+                return True
+        return False
+
+    def place(self, p, color):
+        """ Play a legal stone, capture what it takes and update the ko point. """
+        stones, chain, liberties = self.stones, self.chain, self.liberties
+        stones[p] = color
+        self.remove_empty(p)
+        chain[p] = p
+        self.next_stone[p] = p
+        self.chain_size[p] = 1
+        liberties[p] = 0
+        for n in self.neighbors[p]:
+            stone = stones[n]
+            if stone == EMPTY:
+                liberties[p] += 1
+            elif stone != BORDER:
+                liberties[chain[n]] -= 1
+        for n in self.neighbors[p]:
+            if stones[n] == color and chain[n] != chain[p]:
+                self.merge(chain[p], chain[n])
+        captured = 0
+        last_captured = 0
+        for n in self.neighbors[p]:
+            if stones[n] == -color and liberties[chain[n]] == 0:
+                captured += self.remove_chain(n)
+                last_captured = n
+        # A lone stone that took exactly one stone and has one liberty left starts a ko
+        root = chain[p]
+        if captured == 1 and self.chain_size[root] == 1 and liberties[root] == 1:
+            self.ko = last_captured
+        else:
+            self.ko = 0
+
+    def merge(self, first, second):
+        """ Join two chains, the smaller one takes the representative of the larger. """
+        if self.chain_size[first] < self.chain_size[second]:
+            first, second = second, first
+        chain, next_stone = self.chain, self.next_stone
+        stone = second
+        while True:
+            chain[stone] = first
+            stone = next_stone[stone]
+            if stone == second:
+                break
+        next_stone[first], next_stone[second] = next_stone[second], next_stone[first]
+        self.chain_size[first] += self.chain_size[second]
+        self.liberties[first] += self.liberties[second]
+
+    def remove_chain(self, p):
+        """ Take a captured chain off the board and give its points back as liberties. """
+        stones, chain, liberties, next_stone = self.stones, self.chain, self.liberties, self.next_stone
+        removed = 0
+        stone = p
+        while True:
+            stones[stone] = EMPTY
+            self.add_empty(stone)
+            removed += 1
+            stone = next_stone[stone]
+            if stone == p:
+                break
+        while True:
+            for n in self.neighbors[stone]:
+                if stones[n] == BLACK or stones[n] == WHITE:
+                    liberties[chain[n]] += 1
+            stone = next_stone[stone]
+            if stone == p:
+                break
+        return removed
+
+    def random_move(self, color, rng=random):
+        """ A random legal point that is not the player's own eye, or 0 to pass. """
+        empties = self.empties
+        count = len(empties)
+        if count == 0:
+            return 0
+        start = rng.randrange(count)
+        for i in range(count):
+            p = empties[(start + i) % count]
+            if not self.is_eye(p, color) and self.is_legal(p, color):
+                return p
+        return 0
+
+    def score(self, komi=0.0):
+        """ Area score for Black: stones plus empty points only one colour touches. """
+        stones = self.stones
+        total = -komi
+        for p in self.points:
+            stone = stones[p]
+            if stone == EMPTY:
+                owners = {stones[n] for n in self.neighbors[p]} - {BORDER}
+                if len(owners) == 1:
+                    stone = owners.pop()
+            total += stone if stone != BORDER else 0
+        return total
+
+    def playout(self, color, komi=0.0, max_moves=None, rng=random, record=None):
+        """
+        Play random moves from the position until both players pass, starting
+        with color. Returns the winner (BLACK, WHITE or 0). If record is a list,
+        every move is appended to it as (GoBoard point, color).
+        """
+        if max_moves is None:
+            max_moves = 3 * self.size * self.size
+        passes = 0
+        for _ in range(max_moves):
+            p = self.random_move(color, rng)
+            if p:
+                self.place(p, color)
+                passes = 0
+                if record is not None:
+                    record.append((self.unpadded(p), color))
+            else:
+                self.ko = 0
+                passes += 1
+                if passes == 2:
+                    break
+            color = -color
+        total = self.score(komi)
+        return BLACK if total > 0 else WHITE if total < 0 else 0
@@ -0,0 +1,188 @@
+# Bulk random Go self-play
+#
+# Worker processes play random games on the light PlayoutBoard, without
+# filling their own eyes, and hand them back in batches. PlayoutBoard only
+# knows simple ko, so the generator keeps the Zobrist hashes of every position
+# of the game, with GoBoard's keys, and never plays a move that repeats one.
+# Every record is therefore legal under GoBoard's positional superko. The main
+# process appends every batch to one record file as soon as it arrives:
+#
+#   header: magic b"GOSP", format version (uint16), board size (uint8)
+#   game:   result (int8), number of moves (uint16), moves (uint16 each)
+#
+# Moves are GoBoard point indices (row * size + col) and size * size is a
+# pass. Black moves first and the players alternate, passes included. The
+# result is the area score winner: BLACK (1), WHITE (-1) or 0 for a draw.
+# Everything is little-endian. Version 1 files were written with simple ko
+# only and may hold superko repeats, read_games refuses them.
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from go_board import BLACK, WHITE, zobrist_table
+from go_playout import PlayoutBoard
+
+MAGIC = b"GOSP"
+VERSION = 2
+HEADER = struct.Struct("<4sHB")
+GAME = struct.Struct("<bH")
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "random_games.bin")
+
+
+def position_key(board, zobrist, key, p, color):
+    """ GoBoard hash of the position after color plays p on the board with hash key, captures included. """
+    stones, chain, next_stone = board.stones, board.chain, board.next_stone
+    neighbors = board.neighbors[p]
+    key ^= zobrist[color][board.unpadded(p)]
+    seen = []
+    for n in neighbors:
+        if stones[n] != -color or chain[n] in seen:
+            continue
+        root = chain[n]
+        seen.append(root)
+        # Captured when the stone takes every pseudo-liberty the chain has left
+        touching = sum(1 for m in neighbors if stones[m] == -color and chain[m] == root)
+        if board.liberties[root] == touching:
+            stone = root
+            while True:
+                key ^= zobrist[-color][board.unpadded(stone)]
+                stone = next_stone[stone]
+                if stone == root:
+                    break
+    return key
+
+
+def random_move(board, color, zobrist, key, history, rng):
+    """
+    Like PlayoutBoard.random_move, but also skips moves that repeat a position
+    in history. Returns the point and the new hash, or (0, key) to pass.
+    """
+    empties = board.empties
+    count = len(empties)
+    if count == 0:
+        return 0, key
+    start = rng.randrange(count)
+    for i in range(count):
+        p = empties[(start + i) % count]
+        if not board.is_eye(p, color) and board.is_legal(p, color):
+            next_key = position_key(board, zobrist, key, p, color)
+            if next_key not in history:
+                return p, next_key
+    return 0, key
+
+
+def play_game(board, komi, max_moves, rng):
+    """ One random game from the empty board, returns the result and the moves as an array of uint16. """
+    board.clear()
+    zobrist = zobrist_table(board.size)
+    key, history = 0, {0}
+    pass_point = board.size * board.size
+    moves = array("H")
+    color, passes = BLACK, 0
+    for _ in range(max_moves):
+        p, key = random_move(board, color, zobrist, key, history, rng)
+        if p:
+            board.place(p, color)
+            history.add(key)
+            moves.append(board.unpadded(p))
+            passes = 0
+        else:
+            board.ko = 0
+            moves.append(pass_point)
+            passes += 1
+            if passes == 2:
+                break
+        color = -color
+    total = board.score(komi)
+    return (BLACK if total > 0 else WHITE if total < 0 else 0), moves
+
+
+def play_games(size, count, komi, max_moves, seed):
+    """
+    Play a batch of games in a worker process.
+    Returns the encoded games and the number of games each player won.
+    """
+    rng = random.Random(seed)
+    board = PlayoutBoard(size)
+    chunks = []
+    wins = {BLACK: 0, WHITE: 0, 0: 0}
+    for _ in range(count):
+        result, moves = play_game(board, komi, max_moves, rng)
+        if sys.byteorder == "big":
+            moves.byteswap()
+        chunks.append(GAME.pack(result, len(moves)))
+        chunks.append(moves.tobytes())
+        wins[result] += 1
+    return b"".join(chunks), wins
+
+
+def read_games(path):
+    """
+    Board size of a record file and a generator of its (result, moves) games.
+    The generator opens the file itself and closes it when it is exhausted,
+    closed or dropped.
+    """
+    with open(path, "rb") as record_file:
+        magic, version, size = HEADER.unpack(record_file.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} Go game record")
+
+    def games():
+        with open(path, "rb") as record_file:
+            record_file.seek(HEADER.size)
+            while True:
+                head = record_file.read(GAME.size)
+                if not head:
+                    return
+                result, length = GAME.unpack(head)
+                moves = array("H")
+                moves.frombytes(record_file.read(2 * length))
+                if sys.byteorder == "big":
+                    moves.byteswap()
+                yield result, moves
+
+    return size, games()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play random Go games in parallel and write them to a record file.")
+    parser.add_argument("--games", type=int, default=10000, help="Total number of games.")
+    parser.add_argument("--size", type=int, default=9, help="Board size.")
+    parser.add_argument("--batch", type=int, default=500, help="Games a worker plays before sending them back.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of playing processes.")
+    parser.add_argument("--komi", type=float, default=0, help="Points added to White's score.")
+    parser.add_argument("--max-moves", type=int, default=None, help="Moves after which a game is scored as it stands.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible games.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Record file to write.")
+    args = parser.parse_args()
+
+    max_moves = args.max_moves if args.max_moves is not None else 3 * args.size * args.size
+    seed = args.seed if args.seed is not None else random.SystemRandom().getrandbits(32)
+    counts = [min(args.batch, args.games - start) for start in range(0, args.games, args.batch)]
+
+    start = time.perf_counter()
+    results = {BLACK: 0, WHITE: 0, 0: 0}
+    written = 0
+    with open(args.output, "wb") as record_file, ProcessPoolExecutor(max_workers=args.workers) as executor:
+        record_file.write(HEADER.pack(MAGIC, VERSION, args.size))
+        batches = executor.map(play_games, [args.size] * len(counts), counts, [args.komi] * len(counts),
+                               [max_moves] * len(counts), [seed + i for i in range(len(counts))])
+        for count, (data, wins) in zip(counts, batches):
+            record_file.write(data)
+            for result, won in wins.items():
+                results[result] += won
+            written += count
+    elapsed = time.perf_counter() - start
+
+    print(f"Black wins: {results[BLACK]}, White wins: {results[WHITE]}, draws: {results[0]}")
+    print(f"{written} games in {elapsed:.1f}s, {written / elapsed:.0f} games/sec, written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
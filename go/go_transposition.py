@@ -0,0 +1,76 @@
+# Transposition table for the Go minimax search
+#
+# A position and its 7 rotations and reflections have the same value, so the
+# table is keyed by the smallest of the board's 8 symmetry hashes, with the
+# side to move mixed in. Best moves are kept as points of that canonical
+# orientation and turned back into the probing board's orientation on the
+# way out.
+
+import random
+
+from go_board import WHITE, symmetry_table
+
+# What a stored score says about the position, scores favour Black
+EXACT = 0  # Black's score with best play to the stored depth
+LOWER_BOUND = 1  # Reached beta, Black scores at least this
+UPPER_BOUND = 2  # Stayed at or under alpha, Black scores at most this
+
+# Mixed into the key while White is to move
+WHITE_TO_MOVE = random.Random(20240602).getrandbits(64)
+
+
+def canonical_key(board, player):
+    """
+    Key shared by a position and its 7 rotations and reflections, for a board
+    made with symmetries=True. Returns the key and the symmetry that maps the
+    board onto the canonical one.
+    """
+    hashes = board.symmetry_hashes
+    symmetry = min(range(8), key=hashes.__getitem__)
+    key = hashes[symmetry]
+    return (key ^ WHITE_TO_MOVE if player == WHITE else key), symmetry
+
+
+def to_canonical(board, move, symmetry):
+    """ (row, col) move as a point of the canonical board. """
+    return symmetry_table(board.size)[0][symmetry][board.point(*move)]
+
+
+def from_canonical(board, point, symmetry):
+    """ Point of the canonical board as a (row, col) move on this board. """
+    return board.coords(symmetry_table(board.size)[1][symmetry][point])
+
+
+class TranspositionTable:
+    """
+    Search results of go_minmax, one slot per key % size. The small boards
+    the minimax player runs on reach few enough positions that 2**18 slots
+    hold a whole move's search. A slot keeps the deeper result, except that
+    results from an earlier move of the game are always overwritten.
+    """
+
+    def __init__(self, size=1 << 18):
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+
+    def new_search(self):
+        """ Start the search for the next move of the game. """
+        self.generation += 1
+
+    def clear(self):
+        self.slots = [None] * self.size
+
+    def probe(self, key):
+        """ Stored (depth, bound, canonical best point, value) of a canonical key, or None. """
+        entry = self.slots[key % self.size]
+        if entry is None or entry[0] != key:
+            return None
+        return entry[1:5]
+
+    def store(self, key, depth, bound, move, value):
+        """ Record the result of searching a position, move is a point of the canonical board. """
+        index = key % self.size
+        entry = self.slots[index]
+        if entry is None or entry[0] == key or entry[5] != self.generation or depth >= entry[1]:
+            self.slots[index] = (key, depth, bound, move, value, self.generation)